@@ -10,10 +10,18 @@
 """
 import os
 from datetime import datetime
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, Future
+import queue
+import asyncio
+import sqlite3
 import time
 import json
-import graphics
+import hashlib
+import tempfile
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from tkinter import ttk
 import tkinter as tk
 import threading
@@ -21,6 +29,234 @@ from PIL import ImageTk, Image
 import requests
 from io import BytesIO
 import webbrowser
+from catalog import (Test, TestCatalog, Storage, FlatFileStorage, JournalStorage, SQLiteStorage, openStorage,
+                     toEpoch, fromEpoch, parseDateString, parseDateStrings)
+
+class Credentials:
+    """
+    Process-wide cache of the API keys file. The file is read once and only read again when its modification time
+    changes, so every API object after the first costs no file I/O.
+    """
+    lock = threading.Lock()
+    files = {}  # path -> (modification time, lines of the file)
+
+    @classmethod
+    def getKey(cls, api_name, path="../api_key.txt"):
+        """
+        Purpose: This function finds the key of an API in the keys file.
+        Parameters: This function takes the name of the API (string) and the path of the keys file (string).
+        Returns: Returns the key as a string, or None if the file has no key for the API.
+        """
+        with cls.lock:
+            mtime = os.stat(path).st_mtime_ns
+            if path not in cls.files or cls.files[path][0] != mtime:
+                file = open(path, 'r')
+                cls.files[path] = (mtime, file.readlines())
+                file.close()
+            lines = cls.files[path][1]
+
+        for line in lines:
+            if api_name in line:
+                return line.strip().split(',')[1]
+        return None
+
+
+class HTTPClient:
+    """
+    Shared HTTP layer for every outbound request. One requests.Session keeps connections alive and pooled per host so
+    repeated calls to googleapis and ytimg skip the TCP and TLS handshakes, and failed GETs are retried with
+    exponential backoff.
+    """
+    lock = threading.Lock()
+    instance = None
+
+    def __init__(self, timeout=10, retries=3, backoff=0.5, poolSize=10):
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(total=retries, backoff_factor=backoff, status_forcelist=(429, 500, 502, 503, 504),
+                      allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=poolSize, pool_maxsize=poolSize, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    @classmethod
+    def shared(cls):
+        with cls.lock:
+            if cls.instance is None:
+                cls.instance = cls()
+            return cls.instance
+
+    def get(self, url, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(url, **kwargs)
+
+
+class ResponseCache:
+    """
+    Persistent cache of API responses in an SQLite file so repeated searches survive app restarts. Entries older than
+    ttl seconds are treated as missing, and once there are more than maxEntries the least recently used ones are
+    evicted.
+    """
+    lock = threading.Lock()
+    instances = {}  # path -> ResponseCache shared by every client in the process
+
+    def __init__(self, path="response_cache.db", ttl=24 * 60 * 60, maxEntries=2000):
+        self.path = path
+        self.ttl = ttl
+        self.maxEntries = maxEntries
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS responses "
+                                    "(key TEXT PRIMARY KEY, value TEXT, created REAL, accessed REAL)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @classmethod
+    def shared(cls, path="response_cache.db"):
+        with cls.lock:
+            if path not in cls.instances:
+                cls.instances[path] = cls(path)
+            return cls.instances[path]
+
+    def get(self, key, stale=False):
+        """
+        Purpose: This function looks up a cached response and marks it as recently used.
+        Parameters: This function takes the cache key (string), and whether an expired response is still acceptable.
+        Returns: Returns the decoded JSON response, or None if it isn't cached or has expired.
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            row = self.connection.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] + self.ttl < now and not stale):
+                return None
+            self.connection.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        """
+        Purpose: This function stores a response and evicts the least recently used entries past maxEntries.
+        Parameters: This function takes the cache key (string) and the JSON-serialisable response.
+        Returns: N/A
+        """
+        now = time.time()
+        with self.lock, self.connection:
+            self.connection.execute("INSERT OR REPLACE INTO responses (key, value, created, accessed) VALUES (?, ?, ?, ?)",
+                                    (key, json.dumps(value), now, now))
+            count = self.connection.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+            if count > self.maxEntries:
+                self.connection.execute("DELETE FROM responses WHERE key IN "
+                                        "(SELECT key FROM responses ORDER BY accessed LIMIT ?)", (count - self.maxEntries,))
+
+
+class QuotaExceededError(Exception):
+    pass
+
+
+class QuotaManager:
+    """
+    Keeps each API key within its daily quota and request rate. Every request is charged its endpoint's cost against
+    a daily budget that is saved to disk, so restarting the app doesn't reset it, and requests are spaced out by a
+    token bucket per key. usage() reports the counters so deployments can be sized.
+    """
+    lock = threading.Lock()
+    instances = {}  # path -> QuotaManager shared by every client in the process
+
+    def __init__(self, path="quota.json", dailyLimit=10000, rate=5.0, burst=10):
+        self.path = path
+        self.dailyLimit = dailyLimit
+        self.rate = rate  # requests per second refilled into each bucket
+        self.burst = burst  # most requests a bucket can hold
+        self.buckets = {}  # key id -> [tokens, time of last refill]
+        self.counters = {"day": str(datetime.now().date()), "keys": {}}
+        if os.path.exists(path):
+            file = open(path, 'r')
+            self.counters = json.load(file)
+            file.close()
+
+    @classmethod
+    def shared(cls, path="quota.json"):
+        with cls.lock:
+            if path not in cls.instances:
+                cls.instances[path] = cls(path)
+            return cls.instances[path]
+
+    def keyId(self, apiKey):
+        return hashlib.sha1(str(apiKey).encode()).hexdigest()[:8]  # so the key itself is never written to disk
+
+    def rollOver(self):
+        today = str(datetime.now().date())
+        if self.counters["day"] != today:
+            self.counters = {"day": today, "keys": {}}
+
+    def keyCounters(self, apiKey):
+        self.rollOver()
+        return self.counters["keys"].setdefault(self.keyId(apiKey), {"units": 0, "requests": 0, "throttled": 0,
+                                                                     "degraded": 0, "endpoints": {}})
+
+    def acquire(self, apiKey, endpoint, cost):
+        """
+        Purpose: This function charges a request to an API key, waiting for the key's token bucket if requests are
+                 coming in too fast.
+        Parameters: This function takes the API key (string), the endpoint name (string) and its cost in units (int).
+        Returns: N/A. Raises QuotaExceededError if the request would go over the daily budget.
+        """
+        while True:
+            with self.lock:
+                counters = self.keyCounters(apiKey)
+                if counters["units"] + cost > self.dailyLimit:
+                    counters["degraded"] += 1
+                    raise QuotaExceededError("daily quota of %d units used up" % self.dailyLimit)
+
+                now = time.monotonic()
+                bucket = self.buckets.setdefault(self.keyId(apiKey), [self.burst, now])
+                bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+                bucket[1] = now
+                if bucket[0] >= 1:
+                    bucket[0] -= 1
+                    counters["units"] += cost
+                    counters["requests"] += 1
+                    counters["endpoints"][endpoint] = counters["endpoints"].get(endpoint, 0) + cost
+                    self.save()
+                    return
+                counters["throttled"] += 1
+                wait = (1 - bucket[0]) / self.rate
+            time.sleep(wait)
+
+    def exhaust(self, apiKey):
+        """
+        Purpose: This function marks a key's budget as used up for the day, for when the API itself says so.
+        Parameters: This function takes the API key (string).
+        Returns: N/A
+        """
+        with self.lock:
+            self.keyCounters(apiKey)["units"] = self.dailyLimit
+            self.save()
+
+    def save(self):
+        file = open(self.path + ".tmp", 'w')
+        json.dump(self.counters, file)
+        file.close()
+        os.replace(self.path + ".tmp", self.path)
+
+    def usage(self):
+        """
+        Purpose: This function reports today's usage of every key.
+        Parameters: N/A
+        Returns: Returns a dictionary with the day, the daily limit and, per key id, the units spent (in total and per
+                 endpoint), the number of requests, how often a request had to wait for the rate limiter and how
+                 often a call was served from the cache because the budget was used up.
+        """
+        with self.lock:
+            self.rollOver()
+            usage = json.loads(json.dumps(self.counters))
+        usage["limit"] = self.dailyLimit
+        for counters in usage["keys"].values():
+            counters["remaining"] = max(0, self.dailyLimit - counters["units"])
+        return usage
+
+
+def normalizeQuery(query):
+    return " ".join(query.lower().split())
+
 
 class API:
     def __init__(self, api_name):
@@ -28,172 +264,252 @@ class API:
         self.api_key = self.readAPIKey()
 
     def readAPIKey(self):
-        file = open("../api_key.txt", 'r')
-        for line in file:
-            if self.api_name in line:
-                file.close()
-                self.api_key = line.strip().split(',')[1]
-                return self.api_key
+        self.api_key = Credentials.getKey(self.api_name)
+        return self.api_key
 
 
 class YouTubeAPI(API):
-    def __init__(self):
-        super().__init__('yt')
-        self.search_url = 'https://www.googleapis.com/youtube/v3/search?part=snippet&type=video&order=relevance&relevanceLanguage=en&key=%s' % self.api_key
+    base_url = 'https://www.googleapis.com/youtube/v3'
+    max_ids = 50  # most ids the videos endpoint accepts in one call
+    costs = {"search": 100, "videos": 1}  # quota units the API charges per request
+    inflightLock = threading.Lock()
+    inflight = {}  # normalized query -> (number of results, Future) of the search currently being fetched
 
-    def searchVideo(self, query, numResults):
-        search_url = self.search_url + ("&q=%s" % query) + ("&maxResults=%d" % numResults)
-        data = requests.get(search_url)
-        data = data.json()
+    def __init__(self, cache=None, http=None, quota=None):
+        super().__init__('yt')
+        if cache is None:
+            cache = ResponseCache.shared()
+        if http is None:
+            http = HTTPClient.shared()
+        if quota is None:
+            quota = QuotaManager.shared()
+        self.cache = cache
+        self.http = http
+        self.quota = quota
+        self.unitsUsed = 0  # quota units spent by this client on requests that missed the cache
+        self.search_url = self.base_url + '/search?part=snippet&type=video&order=relevance&relevanceLanguage=en&key=%s' % self.api_key
+        self.videos_url = self.base_url + '/videos?key=%s' % self.api_key
+
+    def searchVideo(self, query, numResults, hydrate=False):
+        data = self.searchData(query, numResults)
         videos = []
         try:
             for video in data["items"]:
-                videos.append(Video(video))
+                videos.append(Video(video, client=self))
         except Exception:
             print("Sorry API quota exceeded")
 
+        if hydrate:
+            self.hydrate(videos)
         return videos
 
+    def hydrate(self, videos):
+        """
+        Purpose: This function fills in the details (duration and full description) of many videos with one batched
+                 lookup, for callers that know they will need them.
+        Parameters: This function takes the list of videos.
+        Returns: Returns the list of videos.
+        """
+        missing = [video for video in videos if video.details is None]
+        details = self.getVideoDetails([video.video_id for video in missing])
+        for video in missing:
+            video.details = details.get(video.video_id)
+        return videos
+
+    def searchData(self, query, numResults):
+        """
+        Purpose: This function gets the raw search response for a query. A cached or in-flight search for the same
+                 query with at least as many results is reused, so identical searches fired at the same time (from any
+                 client in the process) share one request.
+        Parameters: This function takes the query (string) and the number of results (int).
+        Returns: Returns the decoded JSON response, trimmed to numResults items.
+        """
+        key = normalizeQuery(query)
+        cached = self.cache.get("search:" + key)
+        if cached is not None and cached["maxResults"] >= numResults:
+            return self.trimResults(cached["response"], numResults)
+
+        with YouTubeAPI.inflightLock:
+            flight = YouTubeAPI.inflight.get(key)
+            leader = flight is None or flight[0] < numResults
+            if leader:
+                flight = (numResults, Future())
+                YouTubeAPI.inflight[key] = flight
+
+        if not leader:
+            return self.trimResults(flight[1].result(), numResults)
+
+        try:
+            try:
+                self.quota.acquire(self.api_key, "search", self.costs["search"])
+                search_url = self.search_url + ("&q=%s" % query) + ("&maxResults=%d" % numResults)
+                data = self.http.get(search_url)
+                self.unitsUsed += self.costs["search"]
+                data = data.json()
+                self.checkQuota(data)
+            except QuotaExceededError:
+                # out of quota, so fall back to whatever was cached before, however old
+                data = self.cache.get("search:" + key, stale=True)
+                data = self.trimResults(data["response"], numResults) if data is not None else {}
+                flight[1].set_result(data)
+                return data
+
+            if "items" in data:
+                self.cache.put("search:" + key, {"maxResults": numResults, "response": data})
+            flight[1].set_result(data)
+            return data
+        except Exception as error:
+            flight[1].set_exception(error)
+            raise
+        finally:
+            with YouTubeAPI.inflightLock:
+                if YouTubeAPI.inflight.get(key) is flight:
+                    del YouTubeAPI.inflight[key]
+
+    def trimResults(self, data, numResults):
+        if "items" not in data:
+            return data
+        trimmed = dict(data)
+        trimmed["items"] = data["items"][:numResults]
+        return trimmed
+
+    def getVideoDetails(self, videoIds):
+        """
+        Purpose: This function looks up the full snippet and content details of many videos. Videos in the response
+                 cache are served from it and the rest are fetched with one request to the videos endpoint (per 50 ids)
+                 instead of one request per video.
+        Parameters: This function takes the list of video ids.
+        Returns: Returns a dictionary from video id to the video resource returned by the API.
+        """
+        details = {}
+        missing = []
+        for videoId in videoIds:
+            item = self.cache.get("video:" + videoId)
+            if item is None:
+                missing.append(videoId)
+            else:
+                details[videoId] = item
+
+        for i in range(0, len(missing), self.max_ids):
+            try:
+                self.quota.acquire(self.api_key, "videos", self.costs["videos"])
+                detail_url = self.videos_url + "&part=snippet,contentDetails&id=%s" % ",".join(missing[i:i + self.max_ids])
+                response = self.http.get(detail_url)
+                self.unitsUsed += self.costs["videos"]
+                response = response.json()
+                self.checkQuota(response)
+            except QuotaExceededError:
+                for videoId in missing[i:]:
+                    item = self.cache.get("video:" + videoId, stale=True)
+                    if item is not None:
+                        details[videoId] = item
+                break
+
+            for item in response.get("items", []):
+                details[item["id"]] = item
+                self.cache.put("video:" + item["id"], item)
+
+        return details
+
+    def checkQuota(self, response):
+        """
+        Purpose: This function notices when the API rejected a request because the key's quota ran out, and stops
+                 spending from that key for the rest of the day.
+        Parameters: This function takes the decoded JSON response.
+        Returns: N/A. Raises QuotaExceededError if the quota ran out, so the caller falls back to the cache.
+        """
+        errors = response.get("error", {}).get("errors", [])
+        if any(error.get("reason") in ("quotaExceeded", "dailyLimitExceeded") for error in errors):
+            self.quota.exhaust(self.api_key)
+            raise QuotaExceededError("the API reports the daily quota is used up")
+
 
 class Video:
-    def __init__(self, video_data):
+    """
+    A search result. Everything shown in the gallery grid comes from the search response; the duration and the full
+    description need the video details, which are only looked up (and then remembered) the first time they are used.
+    """
+    def __init__(self, video_data, details=None, client=None):
         self.video_data = video_data
+        self.details = details
+        if client is None:
+            client = YouTubeAPI()
+        self.client = client
         self.video_id = self.video_data["id"]["videoId"]
         self.video_thumbnailurl = self.video_data["snippet"]["thumbnails"]["default"]['url']
         self.video_title = self.video_data["snippet"]["title"]
         self.video_description = self.video_data["snippet"]["description"]
         self.channel = self.video_data["snippet"]["channelTitle"]
         self.api_key = self.getAPIKey()
-        self.base_url = "https://www.googleapis.com/youtube/v3/videos?id=%s&key=%s" % (self.video_id, self.api_key)
         self.link = "https://www.youtube.com/watch?v=%s&feature=youtu.be" % self.video_id
-        self.video_duration = self.getVideoDuration()
+
+    @property
+    def video_duration(self):
+        return self.getVideoDuration()
+
+    @property
+    def full_description(self):
+        return self.getFullDescription()
 
     def getAPIKey(self):
-        yt = YouTubeAPI()
-        return yt.readAPIKey()
+        return self.client.api_key
+
+    def getDetails(self):
+        if self.details is None:
+            self.details = self.client.getVideoDetails([self.video_id])[self.video_id]
+        return self.details
 
     def getFullDescription(self):
-        information_url = self.base_url + "&part=snippet"
-        response = requests.get(information_url)
-        response = response.json()
-        return response["items"][0]["snippet"]["description"]
+        return self.getDetails()["snippet"]["description"]
 
     def getVideoDuration(self):
-        detail_url = self.base_url + "&part=contentDetails"
-        response = requests.get(detail_url)
-        response = response.json()
-        length = response["items"][0]["contentDetails"]["duration"][2:]
+        return self.parseDuration(self.getDetails())
+
+    def parseDuration(self, item):
+        length = item["contentDetails"]["duration"][2:]
         length = length.lower()
         return length
 
 
-class Test:
-    def __init__(self, name, date, description):
-        self.name = name
-        self.date = date
-        self.date_string = self.date.strftime("%b %d %Y %I:%M%p")
-        self.description = description
-
-    def summarize(self):
-        summary = "Test name: %s Test date: %s Test Description: %s" %(self.name, self.date_string, self.description)
-        print(summary)
-        return summary
+class AsyncYouTubeAPI:
+    """
+    Thread-backed asyncio facade over YouTubeAPI for callers that want many queries at once without managing threads
+    themselves. The blocking calls run on a private executor, at most `concurrency` at a time, and share the blocking
+    client's pooled HTTP session, response cache and API key.
+    """
+    def __init__(self, client=None, concurrency=4):
+        if client is None:
+            client = YouTubeAPI()
+        self.client = client
+        self.concurrency = concurrency
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
 
+    async def run(self, function, *args):
+        # nothing here is bound to an event loop, so the same instance works across asyncio.run calls
+        return await asyncio.get_running_loop().run_in_executor(self.executor, function, *args)
 
-class TestCatalog:
-    def __init__(self, doThread=True, root="database.txt"):
-        self.root = root
-        self.tests = self.readDatabase()
-        self.length = len(self.tests)
-        self.rankTests()
-        self.updateDatabase()
+    async def searchVideo(self, query, numResults):
+        return await self.run(self.client.searchVideo, query, numResults)
 
-        if doThread:
-            thread = threading.Thread(target=self.threadedChecker)
-            thread.daemon = True
-            thread.start()
+    async def getVideoDuration(self, video):
+        return await self.run(video.getVideoDuration)
 
-    def __getitem__(self, key):
-        return self.tests[key]
+    async def getFullDescription(self, video):
+        return await self.run(video.getFullDescription)
 
-    def __len__(self):
-        return len(self.tests)
+    async def hydrate(self, videos):
+        return await self.run(self.client.hydrate, videos)
 
-    def readDatabase(self,):
+    async def searchVideos(self, queries, numResults):
         """
-        Purpose: This function reads all the upcoming tests of the user.
-        Parameters: This function takes the path of the database file as a string.
-        Returns: Returns a list of lists with each list containing the test name (string), test date (datetime.datetime)
-                 and topic (string).
+        Purpose: This function runs several searches concurrently.
+        Parameters: This function takes the list of queries (strings) and the number of results for each (int).
+        Returns: Returns a list with the list of videos for each query, in the same order as the queries.
         """
-        file = open(self.root, 'r')
-        tests = []
-        for line in file:
-            line = line.strip().split(',')
-            line[1] = datetime.strptime(line[1], '%b %d %Y %I:%M%p')  # cast the string into a datetime value
-            tests.append(Test(line[0], line[1], line[2]))
+        return await asyncio.gather(*[self.searchVideo(query, numResults) for query in queries])
 
-        file.close()
-        return tests
-
-    def updateDatabase(self):
-        """
-        Purpose: This function updates the database file with the new set of tests.
-        Parameters: This function takes the path to the databse file, a string, and the list of tests which is a list of lists.
-        Returns: N/A
-        """
-        file = open(self.root, 'w')
-        self.rankTests()
-        for test in self.tests:
-            file.write(test.name)
-            file.write(',')
-            file.write(test.date_string)
-            file.write(',')
-            file.write(test.description)
-            file.write("\n")
-
-        file.close()
-
-    def rankTests(self):
-        """
-        Purpose: This function sorts the list of tests by the date of the test.
-        Parameters: It takes the lists of lists where each sublist contains the test name (string), test date (datetime.datetime)
-                    and the topic of the test (string).
-        Returns: Returns a sorted list of tests where each sublist contains the test name (string), test date (datetime.datetime)
-                    and the topic of the test (string).
-        """
-        for i in range(self.length):
-            indexOfEarliest = i
-            for j in range(i + 1, self.length):
-                if self.tests[j].date < self.tests[indexOfEarliest].date:  # finding the test with the earliest test date
-                    indexOfEarliest = j
-
-            self.tests[i], self.tests[indexOfEarliest] = self.tests[indexOfEarliest], self.tests[i]  # swap
-
-        return self.tests
-
-    def __str__(self):
-        summary = ''
-        for test in self.tests:
-            summary += test.summarize() + '\n'
-        return summary
-
-    def threadedChecker(self):
-        while True:
-            valid = []
-            for test in self.tests:
-                if test.date > datetime.now():
-                    valid.append(test)
-            self.tests = valid
-            self.length = len(self.tests)
-            self.updateDatabase()
-            time.sleep(600)
-
-    def addTest(self, test):
-        self.tests.append(test)
-        self.length = len(self)
-        self.updateDatabase()
-        return self.tests
+    def close(self):
+        self.executor.shutdown(wait=False)
 
 
 class App:
@@ -204,7 +520,10 @@ class App:
         self.appWidth = self.root.winfo_screenwidth() * 4 // 5
         self.root.geometry("%dx%d" %(self.appWidth, self.appHeight))
 
-        self.catalog = TestCatalog()
+        self.catalog = TestCatalog(storage=openStorage("database.txt"))
+        self.prefetcher = Prefetcher(self.catalog)
+        self.prefetcher.start()
+        self.catalog.subscribe(lambda event, tests: self.prefetcher.refresh())
 
         self.navigator = self.createNavigator()
         self.root.mainloop()
@@ -222,36 +541,155 @@ class App:
 
 
 class Page(tk.Frame):
+    windowThreshold = 200  # catalogs bigger than this only materialize the rows around the visible ones
+    bufferRows = 20  # rows kept above and below the visible ones in windowed mode
+    eventInterval = 100  # milliseconds between checks for catalog changes
+
     def __init__(self, parent, catalog):
         tk.Frame.__init__(self, master=parent, relief=tk.SUNKEN)
         self.catalog = catalog
+        self.firstRow = 0  # catalog index of the first visible row in windowed mode
+        self.rowValues = {}  # item id -> values currently shown in the table
+        self.rowIds = {}  # (date, name, description, occurrence) -> item id
 
     def createTable(self):
         columns = ('Rank', 'Test', 'Date', 'Description')
         table = ttk.Treeview(self, columns=('Rank', 'Test', 'Date', 'Description'), show='headings')
 
-        verscrlbar = ttk.Scrollbar(self, orient="vertical", command=table.yview)
-        verscrlbar.pack(side='right', fill='x')
-        table.configure(xscrollcommand=verscrlbar.set)
+        verscrlbar = ttk.Scrollbar(self, orient="vertical", command=self.scrollTable)
+        verscrlbar.pack(side='right', fill='y')
+        table.configure(yscrollcommand=self.tableScrolled)
+        self.scrollbar = verscrlbar
 
         for label in columns:
             table.heading(label, text=label)
 
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            table.bind(sequence, self.scrollWheel)
+
         table.pack()
         return table
 
-    def populateTable(self,):
-        for i in range(1, len(self.catalog) + 1):
-            test = self.catalog[i-1]
-            self.table.insert("", "end", values=(i, test.name, test.date_string, test.description))
+    def isWindowed(self):
+        return len(self.catalog) > self.windowThreshold
 
+    def populateTable(self,):
+        """
+        Purpose: This function brings the table up to date with the catalog. Small catalogs are shown in full; big ones
+                 only get the visible rows plus a buffer on either side. Either way only the rows that changed are
+                 touched.
+        Parameters: N/A
+        Returns: N/A
+        """
+        total = len(self.catalog)
+        visibleRows = int(self.table.cget("height"))
+        if self.isWindowed():
+            self.firstRow = max(0, min(self.firstRow, total - visibleRows))
+            start = max(0, self.firstRow - self.bufferRows)
+            end = min(total, self.firstRow + visibleRows + self.bufferRows)
+        else:
+            self.firstRow, start, end = 0, 0, total
+
+        tests = self.catalog[start:end]
+        occurrences = {}
+        rows = []
+        for i in range(len(tests)):
+            test = tests[i]
+            key = (test.epoch, test.name, test.description)
+            occurrences[key] = occurrences.get(key, 0) + 1
+            key = key + (occurrences[key],)
+            if key not in self.rowIds:
+                self.rowIds[key] = "row%d" % len(self.rowIds)
+            rows.append((self.rowIds[key], (start + i + 1, test.name, test.date_string, test.description)))
+
+        self.syncRows(rows)
         self.table.pack()
 
+        if self.isWindowed():
+            self.table.yview_moveto((self.firstRow - start) / max(1, end - start))
+            self.scrollbar.set(self.firstRow / total, min(1, (self.firstRow + visibleRows) / total))
+
+    def tableScrolled(self, first, last):
+        if not self.isWindowed():  # in windowed mode the scrollbar shows the position in the catalog instead
+            self.scrollbar.set(first, last)
+
+    def syncRows(self, rows):
+        """
+        Purpose: This function makes the table show exactly the given rows by deleting the rows that are gone,
+                 inserting the new ones and updating the ones whose values changed. The catalog is kept sorted, so rows
+                 that stay never change order relative to each other and never need moving.
+        Parameters: This function takes the list of (item id, values) pairs in display order.
+        Returns: N/A
+        """
+        wanted = set(iid for iid, values in rows)
+        stale = [iid for iid in self.table.get_children() if iid not in wanted]
+        if stale:
+            self.table.delete(*stale)
+            for iid in stale:
+                del self.rowValues[iid]
+
+        for index in range(len(rows)):
+            iid, values = rows[index]
+            if iid not in self.rowValues:
+                self.table.insert("", index, iid=iid, values=values)
+            elif self.rowValues[iid] != values:
+                self.table.item(iid, values=values)
+            self.rowValues[iid] = values
+
+    def scrollTable(self, *args):
+        """
+        Purpose: This function handles the scrollbar. In windowed mode it moves the window over the catalog, otherwise
+                 it just scrolls the table.
+        Parameters: This function takes the scrollbar command ('moveto', fraction) or ('scroll', amount, 'units'/'pages').
+        Returns: N/A
+        """
+        if not self.isWindowed():
+            self.table.yview(*args)
+            return
+
+        visibleRows = int(self.table.cget("height"))
+        if args[0] == "moveto":
+            self.firstRow = int(float(args[1]) * len(self.catalog))
+        elif args[2] == "pages":
+            self.firstRow += int(args[1]) * visibleRows
+        else:
+            self.firstRow += int(args[1])
+        self.populateTable()
+
+    def scrollWheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scrollTable("scroll", -1, "units")
+        else:
+            self.scrollTable("scroll", 1, "units")
+        return "break"
+
+    def watchCatalog(self):
+        """
+        Purpose: This function keeps the table in sync with the catalog. Catalog events can come from any thread, so
+                 they are queued and the queue is drained on the Tk thread with after().
+        Parameters: N/A
+        Returns: N/A
+        """
+        self.catalogEvents = queue.Queue()
+        self.catalog.subscribe(lambda event, tests: self.catalogEvents.put(event))
+        self.after(self.eventInterval, self.applyCatalogEvents)
+
+    def applyCatalogEvents(self):
+        if not self.winfo_exists():
+            return
+        changed = False
+        while not self.catalogEvents.empty():
+            self.catalogEvents.get()
+            changed = True
+        if changed:
+            self.updateTable()  # one diff for however many events arrived since the last check
+        self.after(self.eventInterval, self.applyCatalogEvents)
+
     def eraseTable(self):
         self.table.delete(*self.table.get_children())
+        self.rowValues = {}
 
     def updateTable(self):
-        self.eraseTable()
         self.populateTable()
 
 
@@ -266,9 +704,8 @@ class HomePage(Page):
         title = tk.Label(self, text="Test List (Ranked In Urgency)", font=("Verdana", 18))
         title.pack()
         self.table = self.createTable()
-
-        self.updateButton = ttk.Button(self, text='UPDATE TABLE', command=self.updateTable())
-        self.updateButton.pack()
+        self.updateTable()
+        self.watchCatalog()
 
         self.nameLabel = None
         self.nameEntry = None
@@ -307,7 +744,6 @@ class HomePage(Page):
             else:
                 self.catalog.addTest(Test(name, date, description))
 
-                self.updateTable()
                 self.nameEntry.delete(0, 'end')
                 self.dateEntry.delete(0, 'end')
                 self.descriptionEntry.delete(0, 'end')
@@ -328,15 +764,145 @@ class StudyMenu(Page):
         self.table.bind("<Double-Button-1>", func=lambda x: self.displayResourcePage())
 
         self.updateTable()
-
-        self.updateButton = ttk.Button(self, text='UPDATE TABLE', command=lambda: self.updateTable())
-        self.updateButton.pack()
+        self.watchCatalog()
 
     def displayResourcePage(self):
         self.controller.chosenTestIndex = self.table.item(self.table.selection())['values'][0] - 1
         self.controller.showFrame(ResourcePage)
 
 
+class ThumbnailCache:
+    """
+    Two level cache of video thumbnails. The raw image bytes are kept on disk by video id, and decoded images are kept
+    in an in-memory LRU along with every resized variant asked for, keyed by (video id, width, height).
+    """
+    lock = threading.Lock()
+    instances = {}  # folder -> ThumbnailCache shared by every gallery in the process
+
+    def __init__(self, folder="thumbnails", maxImages=200, http=None):
+        if http is None:
+            http = HTTPClient.shared()
+        self.folder = folder
+        self.maxImages = maxImages
+        self.http = http
+        self.images = OrderedDict()  # (video id, width, height) -> PIL image; width and height are None for the original
+        os.makedirs(folder, exist_ok=True)
+
+    @classmethod
+    def shared(cls, folder="thumbnails"):
+        with cls.lock:
+            if folder not in cls.instances:
+                cls.instances[folder] = cls(folder)
+            return cls.instances[folder]
+
+    def getImage(self, video, width=None, height=None):
+        """
+        Purpose: This function finds the thumbnail of a video at the given size, going to memory first, then disk, then
+                 the network, and remembers every step for next time.
+        Parameters: This function takes the video, and the width and height to resize to (ints, or None for the
+                    original size).
+        Returns: Returns the PIL image.
+        """
+        key = (video.video_id, width, height)
+        image = self.lookup(key)
+        if image is not None:
+            return image
+
+        if width is None:
+            image = Image.open(BytesIO(self.getBytes(video)))
+            image.load()
+        else:
+            image = self.getImage(video).resize((width, height), Image.LANCZOS)
+
+        with self.lock:
+            self.images[key] = image
+            while len(self.images) > self.maxImages:
+                self.images.popitem(last=False)
+        return image
+
+    def lookup(self, key):
+        with self.lock:
+            image = self.images.get(key)
+            if image is not None:
+                self.images.move_to_end(key)
+            return image
+
+    def getBytes(self, video):
+        path = os.path.join(self.folder, video.video_id + ".jpg")
+        if os.path.exists(path):
+            file = open(path, 'rb')
+            imageFile = file.read()
+            file.close()
+            return imageFile
+
+        response = self.http.get(video.video_thumbnailurl)
+        imageFile = response.content
+        # a temporary file of its own, since the prefetcher and a gallery may download the same thumbnail at once
+        handle, tempPath = tempfile.mkstemp(suffix=".tmp", dir=self.folder)
+        file = os.fdopen(handle, 'wb')
+        file.write(imageFile)
+        file.close()
+        os.replace(tempPath, path)
+        return imageFile
+
+
+class Prefetcher:
+    """
+    Background worker that warms the search, video detail and thumbnail caches for the most urgent tests in the
+    catalog, so opening their resource page doesn't have to wait on the API. It only prefetches while the API key has
+    used less than `budget` units today, as counted by QuotaManager, which leaves the rest of the daily quota to the
+    searches the user makes. It walks the catalog again every `interval` seconds.
+    """
+    def __init__(self, catalog, count=5, budget=2000, interval=15 * 60, numResults=10):
+        self.catalog = catalog
+        self.count = count
+        self.budget = budget
+        self.interval = interval
+        self.numResults = numResults
+        self.wakeUp = threading.Event()
+
+    def start(self):
+        thread = threading.Thread(target=self.run)
+        thread.daemon = True
+        thread.start()
+
+    def refresh(self):
+        self.wakeUp.set()
+
+    def run(self):
+        while True:
+            try:
+                self.prefetch()
+            except Exception:
+                pass  # no network or no key; try again next round
+            self.wakeUp.wait(self.interval)
+            self.wakeUp.clear()
+
+    def prefetch(self):
+        """
+        Purpose: This function warms the caches for the nearest tests in urgency order until the daily budget runs out.
+        Parameters: N/A
+        Returns: Returns the number of tests that were warmed.
+        """
+        yt = YouTubeAPI()
+        thumbnails = ThumbnailCache.shared()
+        warmed = 0
+        for test in self.catalog[:self.count]:
+            # a search that misses the cache costs the search plus one videos call
+            if self.unitsUsedToday(yt) + yt.costs["search"] + yt.costs["videos"] > self.budget:
+                break
+            videos = yt.searchVideo(test.description, self.numResults, hydrate=True)
+            for video in videos:
+                thumbnails.getImage(video)
+            warmed += 1
+
+        return warmed
+
+    def unitsUsedToday(self, yt):
+        counters = yt.quota.usage()["keys"].get(yt.quota.keyId(yt.api_key))
+        return counters["units"] if counters is not None else 0
+
+
 class Gallery(tk.LabelFrame):
     def __init__(self, parent, name):
         if parent.numGalleries > 3:
@@ -354,23 +920,96 @@ class Gallery(tk.LabelFrame):
 
 
 class YouTubeGallery(Gallery):
+    pool = ThreadPoolExecutor(max_workers=8)  # shared by every gallery so opening several doesn't pile up threads
+    pollInterval = 50  # milliseconds between checks for finished downloads
+
     def __init__(self, parent, test, numResults=10):
         super().__init__(parent, "VIDEOS")
         self.yt = YouTubeAPI()
+        self.thumbnails = ThumbnailCache.shared()
         self.test = test
         self.numResults = numResults
-        self.videos = self.yt.searchVideo(test.description, self.numResults)
+        self.videos = []
+        self.photoLabels = []
+        self.buttons = []
+        self.results = queue.Queue()  # finished work handed from the pool back to the Tk thread
+        self.pending = 1
+
         self.addImages()
+        self.pool.submit(self.fetchVideos, self.width//(self.numResults+2), self.height//2)
+        self.after(self.pollInterval, self.pollResults)
 
     def addImages(self):
-        for i in range(len(self.videos)):
-            thumbnail = self.getThumbnail(self.videos[i], self.width//(self.numResults+2), self.height//2)
-            photoLabel = tk.Label(self, width=self.width//(self.numResults+2), height=self.height//2, image=thumbnail)
-            photoLabel.image = thumbnail
+        """
+        Purpose: This function lays out a blank placeholder and button for every result straight away, so the gallery
+                 shows up before anything has been downloaded.
+        Parameters: N/A
+        Returns: N/A
+        """
+        for i in range(self.numResults):
+            placeholder = tk.PhotoImage(width=self.width//(self.numResults+2), height=self.height//2)
+            photoLabel = tk.Label(self, width=self.width//(self.numResults+2), height=self.height//2, image=placeholder)
+            photoLabel.image = placeholder
 
-            button = tk.Button(self, text="Expand and Watch", command=lambda index=i: self.expand(index))
+            button = tk.Button(self, text="Expand and Watch", state=tk.DISABLED, command=lambda index=i: self.expand(index))
             photoLabel.grid(row=0, column=i, padx=10, pady=10)
             button.grid(row=1, column=i)
+            self.photoLabels.append(photoLabel)
+            self.buttons.append(button)
+
+    def fetchVideos(self, width, height):
+        """
+        Purpose: This function runs on the thread pool. It searches for the videos and then queues a download for
+                 every thumbnail so they are fetched and decoded in parallel.
+        Parameters: This function takes the width and height of the thumbnails (ints).
+        Returns: N/A
+        """
+        try:
+            videos = self.yt.searchVideo(self.test.description, self.numResults)
+        except Exception:
+            videos = []
+        self.results.put(("videos", videos))
+        for i in range(len(videos)):
+            self.pool.submit(self.fetchThumbnail, i, videos[i], width, height)
+
+    def fetchThumbnail(self, index, video, width, height):
+        try:
+            image = self.thumbnails.getImage(video, width, height)
+        except Exception:
+            image = None
+        self.results.put(("thumbnail", index, image))
+
+    def pollResults(self):
+        """
+        Purpose: This function runs on the Tk thread and fills in the placeholders with whatever the pool has finished
+                 since the last poll. It keeps polling with after() until every download is done.
+        Parameters: N/A
+        Returns: N/A
+        """
+        if not self.winfo_exists():
+            return  # the gallery was closed while downloading
+
+        while not self.results.empty():
+            result = self.results.get()
+            self.pending -= 1
+            if result[0] == "videos":
+                self.showVideos(result[1])
+            elif result[2] is not None:
+                thumbnail = ImageTk.PhotoImage(result[2])
+                self.photoLabels[result[1]].configure(image=thumbnail)
+                self.photoLabels[result[1]].image = thumbnail
+
+        if self.pending > 0:
+            self.after(self.pollInterval, self.pollResults)
+
+    def showVideos(self, videos):
+        self.videos = videos
+        self.pending += len(videos)
+        for i in range(len(videos), self.numResults):
+            self.photoLabels[i].destroy()
+            self.buttons[i].destroy()
+        for i in range(len(videos)):
+            self.buttons[i].configure(state=tk.NORMAL)
 
     def expand(self, index):
         video = self.videos[index]
@@ -401,19 +1040,10 @@ class YouTubeGallery(Gallery):
         showMoreButton.pack()
 
     def getThumbnail(self, video, width, height):
-        response = requests.get(video.video_thumbnailurl)
-        imageFile = response.content
-
-        imageData = Image.open(BytesIO(imageFile))
-        imageData = self.resizeImage(imageData, width, height)
+        imageData = self.thumbnails.getImage(video, width, height)
         imagePhoto = ImageTk.PhotoImage(imageData)
         return imagePhoto
 
-    def resizeImage(self, image, width, height):
-        newDimensions = (width, height)
-        image = image.resize(newDimensions, Image.ANTIALIAS)
-        return image
-
     def launchVideo(self, video):
         webbrowser.open(video.link)
 
@@ -489,4 +1119,7 @@ if __name__ == "__main__":
         file.close()
         FIRSTTIME = True
 
+    # the app's window is a Toplevel of this hidden root, which graphics used to create when it was imported
+    hiddenRoot = tk.Tk()
+    hiddenRoot.withdraw()
     app = App()
@@ -0,0 +1,70 @@
+"""
+    Description: Times rendering a digest of 10k tests with the original string concatenation against the precompiled
+                 templates in emailer.py. It also times renderDigest with the names and descriptions escaped in one
+                 batch, to show whether escaping each value on its own is worth avoiding.
+    Usage: python benchmarks/bench_digest.py [number of rows]
+"""
+import sys
+from datetime import datetime, timedelta
+from html import escape
+import common
+import catalog
+import emailer
+
+
+def renderWithConcatenation(name, upcoming):
+    # the original emailer loop; it didn't escape anything
+    display = ""
+    for test in upcoming:
+        display += """\n
+               <p><b> Test Name: </b> %s <br>
+               <b> Test Time: </b> %s <br>
+               <b> Test Description: </b> %s <br>
+               </p>
+            """ % (test.name, test.date_string, test.description)
+
+    return """\
+        <html>
+          <body>
+            <p>Hi %s,<br>
+               In the next 24 hours you will have %d test(s)<br>
+            </p>
+            %s
+            <p>Happy Studying! :)
+          </body>
+        </html>
+       """ % (name, len(upcoming), display)
+
+
+def escapeAll(values):
+    # escape a whole list with one call by joining on a character the values don't contain
+    return escape("\0".join(values)).split("\0")
+
+
+def renderWithBatchEscape(name, upcoming):
+    names = escapeAll([test.name for test in upcoming])
+    descriptions = escapeAll([test.description for test in upcoming])
+    rows = [emailer.ROW_HTML(name=names[i], date=upcoming[i].date_string, description=descriptions[i])
+            for i in range(len(upcoming))]
+    return emailer.DIGEST_HTML(name=escape(name), count=len(upcoming), rows="".join(rows))
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    start = datetime(2030, 1, 1)
+    upcoming = [catalog.Test("Test <%d> & co" % i, start + timedelta(seconds=8 * i), "chapter %d \"review\"" % i)
+                for i in range(count)]
+    print("%d rows" % count)
+    common.report("  old: concatenated HTML",
+                  common.best(lambda: renderWithConcatenation("Ann", upcoming), repeat=7))
+    common.report("  batch escaped renderDigest (HTML)",
+                  common.best(lambda: renderWithBatchEscape("Ann", upcoming), repeat=7))
+    common.report("  new: renderDigest (HTML)", common.best(lambda: emailer.renderDigest("Ann", upcoming), repeat=7))
+    common.report("  new: renderText", common.best(lambda: emailer.renderText("Ann", upcoming), repeat=7))
+    common.report("  new: buildMessage (both parts)",
+                  common.best(lambda: emailer.buildMessage("me@example.com", "ann@example.com", "Ann", upcoming),
+                              repeat=7))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+    Description: Measures how long the headless modules take to import with python -X importtime, and fails if any of
+                 them pulls in the GUI stack (tkinter, PIL or requests).
+    Usage: python benchmarks/bench_imports.py
+"""
+import os
+import subprocess
+import sys
+import common
+
+MODULES = ("catalog", "emailer", "reminder_daemon")
+FORBIDDEN = ("tkinter", "PIL", "requests")
+
+
+def importTimes(module):
+    """
+    Purpose: This function imports a module in a fresh interpreter with -X importtime.
+    Parameters: This function takes the module name (string).
+    Returns: Returns a dictionary from every module imported along the way to its cumulative import time in seconds.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module], cwd=root,
+                            capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        times[fields[2].strip()] = int(fields[1]) / 1000000
+    return times
+
+
+def main():
+    failed = False
+    for module in MODULES:
+        times = importTimes(module)
+        common.report("import " + module, times[module])
+        heavy = sorted(name for name in times if name.split(".")[0] in FORBIDDEN)
+        if heavy:
+            print("  imports the GUI stack: " + ", ".join(heavy))
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+    Description: Compares ranking the catalog with the original selection sort against the sorted TestCatalog, at 1k,
+                 10k and 100k tests. For each size it times loading a shuffled catalog and adding one test to it.
+                 The selection sort is quadratic, so at 100k it is estimated from the 10k time unless --full is given.
+    Usage: python benchmarks/bench_ranking.py [--full]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+import common
+import catalog
+
+
+class MemoryStorage(catalog.Storage):
+    """
+    Keeps the tests in memory so only the ranking is timed, not the disk.
+    """
+    def __init__(self, tests):
+        super().__init__(None)
+        self.tests = tests
+
+    def load(self):
+        return list(self.tests)
+
+    def add(self, test):
+        pass
+
+    def remove(self, tests):
+        pass
+
+    def save(self, tests):
+        pass
+
+
+def selectionSort(dates):
+    # the original TestCatalog.rankTests, run over the test dates
+    for i in range(len(dates)):
+        indexOfEarliest = i
+        for j in range(i + 1, len(dates)):
+            if dates[j] < dates[indexOfEarliest]:
+                indexOfEarliest = j
+        dates[i], dates[indexOfEarliest] = dates[indexOfEarliest], dates[i]
+    return dates
+
+
+def makeTests(count):
+    generator = random.Random(count)
+    start = datetime(2030, 1, 1)
+    return [catalog.Test("test %d" % i, start + timedelta(minutes=generator.randrange(10 ** 7)), "description")
+            for i in range(count)]
+
+
+def main():
+    full = "--full" in sys.argv
+    for count in (1000, 10000, 100000):
+        tests = makeTests(count)
+        dates = [test.date for test in tests]
+        extra = catalog.Test("one more", datetime(2031, 6, 1), "description")
+        print("%d tests" % count)
+
+        if count <= 10000 or full:
+            # the original constructor ranked twice (rankTests and again in updateDatabase), addTest once
+            oldLoad = common.best(lambda: selectionSort(selectionSort(list(dates))), repeat=1)
+            oldAdd = common.best(lambda: selectionSort(sorted(dates) + [extra.date]), repeat=1)
+            common.report("  old: load", oldLoad)
+            common.report("  old: add one test", oldAdd)
+        else:
+            scale = (count / 10000) ** 2
+            common.report("  old: load (estimated, --full to run)", oldLoad * scale)
+            common.report("  old: add one test (estimated, --full to run)", oldAdd * scale)
+
+        newLoad = common.best(lambda: catalog.TestCatalog(doThread=False, storage=MemoryStorage(tests)))
+        testCatalog = catalog.TestCatalog(doThread=False, storage=MemoryStorage(tests))
+        newAdd = common.best(lambda: testCatalog.addTest(extra))
+        common.report("  new: load", newLoad)
+        common.report("  new: add one test", newAdd)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+    Description: Times loading a generated database (1M lines by default) with the original per-line strptime loop
+                 against the fixed-offset batch parser behind FlatFileStorage.load.
+    Usage: python benchmarks/bench_startup.py [number of lines]
+"""
+import os
+import random
+import shutil
+import sys
+import tempfile
+from datetime import datetime, timedelta
+import common
+import catalog
+
+
+def writeDatabase(root, count):
+    # about a year of tests at a handful of times of day, like a real catalog
+    generator = random.Random(count)
+    start = datetime(2030, 1, 1)
+    file = open(root, 'w')
+    for i in range(count):
+        date = start + timedelta(days=generator.randrange(366), hours=generator.choice((8, 9, 10, 13, 14, 15)))
+        file.write(catalog.Test("test %d" % i, date, "description %d" % i).serialize())
+    file.close()
+
+
+def loadWithStrptime(root):
+    # the original TestCatalog.readDatabase
+    file = open(root, 'r')
+    tests = []
+    for line in file:
+        line = line.strip().split(',')
+        line[1] = datetime.strptime(line[1], '%b %d %Y %I:%M%p')
+        tests.append(catalog.Test(line[0], line[1], line[2]))
+    file.close()
+    return tests
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    folder = tempfile.mkdtemp()
+    try:
+        root = os.path.join(folder, "database.txt")
+        writeDatabase(root, count)
+        print("%d lines" % count)
+        common.report("  old: strptime per line", common.best(lambda: loadWithStrptime(root), repeat=1))
+        common.report("  new: FlatFileStorage.load", common.best(lambda: catalog.FlatFileStorage(root).load()))
+    finally:
+        shutil.rmtree(folder)
+
+
+if __name__ == "__main__":
+    main()
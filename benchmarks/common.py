@@ -0,0 +1,30 @@
+"""
+    Description: Helpers shared by the benchmark scripts. Run a benchmark from the repository root, for example
+                 python benchmarks/bench_ranking.py
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # so the app's modules import
+
+
+def best(function, repeat=3):
+    """
+    Purpose: This function times a function a few times and keeps the fastest run, which is the one least disturbed
+             by whatever else the machine was doing.
+    Parameters: This function takes the function to time (called without arguments) and how many times to run it.
+    Returns: Returns the fastest time in seconds.
+    """
+    fastest = None
+    for i in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        if fastest is None or elapsed < fastest:
+            fastest = elapsed
+    return fastest
+
+
+def report(label, seconds):
+    print("%-48s %10.2f ms" % (label, seconds * 1000))
@@ -0,0 +1,689 @@
+"""
+    Description: The catalog of the user's tests and the storage engines that keep it on disk. This module only uses
+                 the standard library and imports nothing from the GUI, so headless jobs like emailer.py can load the
+                 catalog without starting tkinter or pulling in PIL and requests.
+"""
+import os
+from datetime import datetime, timedelta
+from functools import lru_cache
+import bisect
+from array import array
+import threading
+
+
+EPOCH = datetime(1970, 1, 1)
+SECOND = timedelta(seconds=1)
+
+
+def toEpoch(date):
+    """
+    Purpose: This function converts a naive datetime into whole seconds since 1970 without applying any timezone.
+    Parameters: This function takes the date (datetime.datetime).
+    Returns: Returns the number of seconds as an int.
+    """
+    return (date - EPOCH) // SECOND
+
+
+def fromEpoch(seconds):
+    """
+    Purpose: This function is the inverse of toEpoch.
+    Parameters: This function takes the number of seconds since 1970 (int).
+    Returns: Returns the naive datetime.datetime.
+    """
+    return EPOCH + timedelta(seconds=seconds)
+
+
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun', 'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+
+@lru_cache(maxsize=4096)
+def formatDay(days):
+    day = datetime.fromordinal(EPOCH_ORDINAL + days)
+    return "%s %02d %d" % (MONTH_NAMES[day.month - 1], day.day, day.year)
+
+
+def formatDateString(epoch):
+    """
+    Purpose: This function formats an epoch in the Test.date_string format ('May 30 2020 10:00AM') without building a
+             datetime or calling strftime. The day part is cached since many tests share a day.
+    Parameters: This function takes the number of seconds since 1970 (int).
+    Returns: Returns the date string.
+    """
+    days, seconds = divmod(epoch, 86400)
+    hour, minute = seconds // 3600, seconds // 60 % 60
+    return "%s %02d:%02d%s" % (formatDay(days), hour % 12 or 12, minute, "AM" if hour < 12 else "PM")
+
+
+class Test:
+    """
+    A test is stored compactly as its name, its date as whole seconds since 1970 (see toEpoch) and its description.
+    The datetime and the formatted date_string are worked out when they are asked for.
+    """
+    __slots__ = ('name', 'epoch', 'description')
+
+    def __init__(self, name, date, description):
+        self.name = name
+        self.epoch = toEpoch(date)
+        self.description = description
+
+    @classmethod
+    def restore(cls, name, epoch, description):
+        """
+        Purpose: This function builds a test straight from a stored epoch without going through a datetime.
+        Parameters: This function takes the test name (string), the date in seconds since 1970 (int) and the
+                    description (string).
+        Returns: Returns the Test.
+        """
+        test = cls.__new__(cls)
+        test.name = name
+        test.epoch = epoch
+        test.description = description
+        return test
+
+    @property
+    def date(self):
+        return fromEpoch(self.epoch)
+
+    @property
+    def date_string(self):
+        return formatDateString(self.epoch)
+
+    def summarize(self):
+        summary = "Test name: %s Test date: %s Test Description: %s" %(self.name, self.date_string, self.description)
+        print(summary)
+        return summary
+
+    def serialize(self):
+        return "%s,%s,%s\n" % (self.name, self.date_string, self.description)
+
+
+MONTHS = {'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+          'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12}
+
+
+def parseDateString(text):
+    """
+    Purpose: This function parses a date in the Test.date_string format ('May 30 2020 10:00AM') by slicing the fixed
+             offsets instead of going through datetime.strptime. Anything that doesn't fit the fixed layout (for
+             example a day that isn't zero padded) falls back to strptime.
+    Parameters: This function takes the date string.
+    Returns: Returns the datetime.datetime.
+    """
+    if len(text) == 19 and text[3] == ' ' and text[6] == ' ' and text[11] == ' ' and text[14] == ':':
+        month = MONTHS.get(text[0:3])
+        hour = text[12:14]
+        meridiem = text[17:19]
+        if month and hour.isdigit() and 1 <= int(hour) <= 12 and meridiem in ('AM', 'PM') \
+                and text[4:6].isdigit() and text[7:11].isdigit() and text[15:17].isdigit():
+            hour = int(hour) % 12
+            if meridiem == 'PM':
+                hour += 12
+            return datetime(int(text[7:11]), month, int(text[4:6]), hour, int(text[15:17]))
+
+    return datetime.strptime(text, '%b %d %Y %I:%M%p')
+
+
+def parseDateStrings(texts, epochs=False):
+    """
+    Purpose: This function parses a whole batch of date strings at once. A catalog only has a handful of distinct days
+             and times of day, so each day and each time is parsed once and every date is put together from the two.
+    Parameters: This function takes a list of date strings in the Test.date_string format, and whether to return
+                seconds since 1970 (see toEpoch) instead of datetimes.
+    Returns: Returns the list of datetime.datetime (or ints) in the same order.
+    """
+    days = {}
+    times = {}
+    dates = []
+    for text in texts:
+        day = days.get(text[:11])
+        timeOfDay = times.get(text[11:])
+        if day is None or timeOfDay is None:
+            date = parseDateString(text)
+            if len(text) != 19 or text[11] != ' ':
+                dates.append(toEpoch(date) if epochs else date)  # not in the fixed layout, so the halves can't be reused
+                continue
+            day = datetime(date.year, date.month, date.day)
+            timeOfDay = date - day
+            if epochs:
+                day, timeOfDay = toEpoch(day), timeOfDay // SECOND
+            days[text[:11]] = day
+            times[text[11:]] = timeOfDay
+        dates.append(day + timeOfDay)
+
+    return dates
+
+
+def openStorage(root):
+    """
+    Purpose: This function picks the storage engine for a database path. SQLite files are recognised by their
+             extension and everything else is treated as a journaled text database.
+    Parameters: This function takes the path of the database as a string.
+    Returns: Returns the storage engine.
+    """
+    if root.endswith((".db", ".sqlite", ".sqlite3")):
+        return SQLiteStorage(root)
+    return JournalStorage(root)
+
+
+class Storage:
+    """
+    Base class of the storage engines behind TestCatalog. Engines must implement load, add, remove and save; the
+    query methods fall back to scanning the loaded tests and engines with an index override them.
+    """
+    def __init__(self, root):
+        self.root = root
+
+    def load(self):
+        raise NotImplementedError
+
+    def add(self, test):
+        raise NotImplementedError
+
+    def remove(self, tests):
+        raise NotImplementedError
+
+    def save(self, tests):
+        raise NotImplementedError
+
+    def upcoming(self, start, end):
+        """
+        Purpose: This function finds the tests taking place in a time window.
+        Parameters: This function takes the start (inclusive) and end (exclusive) of the window as datetime.datetime.
+        Returns: Returns the tests in the window ordered by date.
+        """
+        start, end = toEpoch(start), toEpoch(end)
+        tests = [test for test in self.load() if start <= test.epoch < end]
+        return sorted(tests, key=lambda test: test.epoch)
+
+    def expired(self, now):
+        """
+        Purpose: This function finds the tests that have already taken place.
+        Parameters: This function takes the current time as a datetime.datetime.
+        Returns: Returns the expired tests ordered by date.
+        """
+        now = toEpoch(now)
+        tests = [test for test in self.load() if test.epoch <= now]
+        return sorted(tests, key=lambda test: test.epoch)
+
+    def rank(self, k):
+        """
+        Purpose: This function finds the test with the given urgency rank.
+        Parameters: This function takes the rank counting from 0 (int).
+        Returns: Returns the test, or None if there are not that many tests.
+        """
+        tests = sorted(self.load(), key=lambda test: test.epoch)
+        if k < len(tests):
+            return tests[k]
+        return None
+
+    def count(self):
+        return len(self.load())
+
+
+class FlatFileStorage(Storage):
+    """
+    Stores the tests as one name,date,description line per test. Every change rewrites the file.
+    """
+    def __init__(self, root):
+        super().__init__(root)
+        self.lock = threading.RLock()
+
+    def load(self):
+        lines = self.readLines()
+        if lines and lines[0].startswith(JournalStorage.header):
+            lines = lines[1:]  # the snapshot was last written by JournalStorage
+        return self.parseLines(lines)
+
+    def readLines(self):
+        file = open(self.root, 'r')
+        lines = file.read().splitlines()
+        file.close()
+        return lines
+
+    def parseLines(self, lines):
+        rows = [line.strip().split(',') for line in lines]
+        epochs = parseDateStrings([row[1] for row in rows], epochs=True)  # cast the strings into epoch values
+        return [Test.restore(rows[i][0], epochs[i], rows[i][2]) for i in range(len(rows))]
+
+    def parseRecord(self, line):
+        line = line.strip().split(',')
+        line[1] = parseDateString(line[1])  # cast the string into a datetime value
+        return Test(line[0], line[1], line[2])
+
+    def add(self, test):
+        with self.lock:
+            tests = self.load()
+            tests.append(test)
+            self.save(tests)
+
+    def remove(self, tests):
+        with self.lock:
+            remaining = self.load()
+            for test in tests:
+                for i in range(len(remaining)):
+                    if remaining[i].serialize() == test.serialize():
+                        del remaining[i]
+                        break
+            self.save(remaining)
+
+    def save(self, tests):
+        with self.lock:
+            self.writeSnapshot(sorted(tests, key=lambda test: test.epoch))
+
+    def writeSnapshot(self, tests, header=None):
+        """
+        Purpose: This function writes the tests to a temporary file and swaps it in place of the database file so a
+                 crash mid-write never leaves a half written database behind.
+        Parameters: This function takes the list of tests to write and an optional first line to write before them.
+        Returns: N/A
+        """
+        tempRoot = self.root + ".tmp"
+        file = open(tempRoot, 'w')
+        if header is not None:
+            file.write(header + "\n")
+        for test in tests:
+            file.write(test.serialize())
+
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+        os.replace(tempRoot, self.root)
+
+
+class JournalStorage(FlatFileStorage):
+    """
+    Keeps the flat file as a snapshot and appends adds ('+') and expirations ('-') to a journal next to it. Once the
+    journal passes compactThreshold entries a background thread folds it into a fresh snapshot.
+
+    Every journal entry is numbered, and the snapshot starts with a "#journal <number>" line giving the last entry
+    folded into it. Replaying skips the entries at or below that number, so a journal that was already folded changes
+    nothing while identical tests added twice are still kept twice.
+    """
+    header = "#journal "
+
+    def __init__(self, root, compactThreshold=500):
+        super().__init__(root)
+        self.journalRoot = root + ".log"
+        self.compactThreshold = compactThreshold
+        self.journalLength = 0
+        self.sequence = None  # number of the last journal entry, known once the storage has been loaded
+        self.saves = 0  # full snapshots written by save, so a compaction can tell it has been overtaken
+        self.compacting = False
+
+    def readSnapshot(self):
+        """
+        Purpose: This function reads the snapshot in the database file.
+        Parameters: N/A
+        Returns: Returns the number of the last journal entry folded into the snapshot (0 for a plain flat file) and
+                 the list of tests.
+        """
+        lines = self.readLines()
+        folded = 0
+        if lines and lines[0].startswith(self.header):
+            folded = int(lines[0][len(self.header):])
+            lines = lines[1:]
+        return folded, self.parseLines(lines)
+
+    def load(self):
+        """
+        Purpose: This function reads the snapshot in the database file and then replays any entries left in the
+                 journal on top of it.
+        Parameters: N/A
+        Returns: Returns the list of tests.
+        """
+        with self.lock:
+            folded, tests = self.readSnapshot()
+            self.journalLength = 0
+            # a compaction that crashed before finishing leaves its rotated journal behind
+            for path in (self.journalRoot + ".old", self.journalRoot):
+                if os.path.exists(path):
+                    entries, folded = self.replayJournal(path, tests, folded)
+                    self.journalLength += entries
+            self.sequence = folded
+
+        return tests
+
+    def replayJournal(self, path, tests, after):
+        """
+        Purpose: This function applies the adds and expirations recorded in a journal file to a list of tests.
+                 Entries numbered at or below `after` are already in the tests and are skipped.
+        Parameters: This function takes the path to the journal file (string), the list of tests to update and the
+                    number of the last entry already applied (int).
+        Returns: Returns the number of journal entries replayed and the number of the last entry applied.
+        """
+        present = {}
+        for test in tests:
+            present.setdefault(test.serialize(), []).append(test)
+
+        entries = 0
+        file = open(path, 'r')
+        for line in file:
+            if not line.endswith("\n"):
+                continue  # skip a torn final write from a crash
+            op, sequence, record = line.split(',', 2)
+            sequence = int(sequence)
+            if sequence <= after:
+                continue
+            test = self.parseRecord(record)
+            matches = present.setdefault(test.serialize(), [])
+            if op == '+':
+                matches.append(test)
+            elif op == '-' and matches:
+                matches.pop()
+            after = sequence
+            entries += 1
+
+        file.close()
+        tests[:] = [test for matches in present.values() for test in matches]
+        return entries, after
+
+    def add(self, test):
+        self.logChanges('+', [test])
+
+    def remove(self, tests):
+        if tests:
+            self.logChanges('-', tests)
+
+    def save(self, tests):
+        with self.lock:
+            if self.sequence is None:
+                self.load()
+            self.writeSnapshot(sorted(tests, key=lambda test: test.epoch), self.header + str(self.sequence))
+            if os.path.exists(self.journalRoot):
+                os.remove(self.journalRoot)
+            self.journalLength = 0
+            self.saves += 1
+
+    def logChanges(self, op, tests):
+        """
+        Purpose: This function appends adds ('+') or expirations ('-') to the journal instead of rewriting the whole
+                 database, and starts a background compaction once the journal passes the size threshold.
+        Parameters: This function takes the operation (string) and the list of tests it applies to.
+        Returns: N/A
+        """
+        with self.lock:
+            if self.sequence is None:
+                self.load()  # to number the new entries after the ones already on disk
+            file = open(self.journalRoot, 'a')
+            for test in tests:
+                self.sequence += 1
+                file.write("%s,%d,%s" % (op, self.sequence, test.serialize()))
+
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+            self.journalLength += len(tests)
+
+            if self.journalLength >= self.compactThreshold and not self.compacting:
+                self.compacting = True
+                thread = threading.Thread(target=self.compact)
+                thread.daemon = True
+                thread.start()
+
+    def rotateJournal(self, oldRoot):
+        """
+        Purpose: This function moves the journal aside to oldRoot. If a compaction that crashed left oldRoot behind,
+                 the journal is appended to it instead so none of its entries are lost. Callers must hold the lock.
+        Parameters: This function takes the path to rotate the journal to (string).
+        Returns: N/A
+        """
+        if not os.path.exists(oldRoot):
+            os.replace(self.journalRoot, oldRoot)
+            return
+
+        file = open(oldRoot, 'r')
+        entries = file.read()
+        file.close()
+        entries = entries[:entries.rfind("\n") + 1]  # drop a torn final write
+        file = open(self.journalRoot, 'r')
+        entries += file.read()
+        file.close()
+
+        file = open(oldRoot + ".tmp", 'w')
+        file.write(entries)
+        file.flush()
+        os.fsync(file.fileno())
+        file.close()
+        os.replace(oldRoot + ".tmp", oldRoot)
+        os.remove(self.journalRoot)  # entries left in both after a crash here are numbered, so replay skips the copy
+
+    def compact(self):
+        """
+        Purpose: This function folds the journal into a fresh snapshot of the database. The journal is rotated aside
+                 under the lock so new changes keep appending while the rotated entries are replayed, and the snapshot
+                 is written under the lock again. If save wrote a full snapshot in the meantime, that one already has
+                 everything and is kept.
+        Parameters: N/A
+        Returns: N/A
+        """
+        oldRoot = self.journalRoot + ".old"
+        try:
+            with self.lock:
+                if os.path.exists(self.journalRoot):
+                    self.rotateJournal(oldRoot)
+                self.journalLength = 0
+                saves = self.saves
+
+            folded, tests = self.readSnapshot()
+            if os.path.exists(oldRoot):
+                _, folded = self.replayJournal(oldRoot, tests, folded)
+
+            with self.lock:
+                if self.saves == saves:
+                    self.writeSnapshot(sorted(tests, key=lambda test: test.epoch), self.header + str(folded))
+                if os.path.exists(oldRoot):
+                    os.remove(oldRoot)
+        finally:
+            self.compacting = False
+
+
+class SQLiteStorage(Storage):
+    """
+    Stores the tests in an SQLite table with an index on the test date, so the date queries are index range scans
+    instead of loading the whole catalog.
+    """
+    def __init__(self, root):
+        import sqlite3  # only needed when an SQLite database is actually opened
+
+        super().__init__(root)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(root, check_same_thread=False)
+        with self.connection:
+            self.connection.execute("CREATE TABLE IF NOT EXISTS tests "
+                                    "(id INTEGER PRIMARY KEY, name TEXT, date INTEGER, description TEXT)")
+            self.connection.execute("CREATE INDEX IF NOT EXISTS tests_date ON tests (date)")
+
+    def query(self, sql, parameters=()):
+        with self.lock:
+            rows = self.connection.execute(sql, parameters).fetchall()
+        return [Test.restore(name, date, description) for name, date, description in rows]
+
+    def load(self):
+        return self.query("SELECT name, date, description FROM tests ORDER BY date")
+
+    def add(self, test):
+        with self.lock, self.connection:
+            self.connection.execute("INSERT INTO tests (name, date, description) VALUES (?, ?, ?)",
+                                    (test.name, test.epoch, test.description))
+
+    def remove(self, tests):
+        with self.lock, self.connection:
+            for test in tests:
+                self.connection.execute("DELETE FROM tests WHERE id = (SELECT id FROM tests "
+                                        "WHERE name = ? AND date = ? AND description = ? LIMIT 1)",
+                                        (test.name, test.epoch, test.description))
+
+    def save(self, tests):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM tests")
+            self.connection.executemany("INSERT INTO tests (name, date, description) VALUES (?, ?, ?)",
+                                        [(test.name, test.epoch, test.description) for test in tests])
+
+    def upcoming(self, start, end):
+        return self.query("SELECT name, date, description FROM tests WHERE date >= ? AND date < ? ORDER BY date",
+                          (toEpoch(start), toEpoch(end)))
+
+    def expired(self, now):
+        return self.query("SELECT name, date, description FROM tests WHERE date <= ? ORDER BY date",
+                          (toEpoch(now),))
+
+    def rank(self, k):
+        tests = self.query("SELECT name, date, description FROM tests ORDER BY date LIMIT 1 OFFSET ?", (k,))
+        if tests:
+            return tests[0]
+        return None
+
+    def count(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM tests").fetchone()[0]
+
+
+class TestCatalog:
+    def __init__(self, doThread=True, root="database.txt", storage=None):
+        self.root = root
+        if storage is None:
+            storage = FlatFileStorage(root)
+        self.storage = storage
+
+        # Writers hold expiryChanged, which also wakes the expiry thread, and never change a published list: they build
+        # new ones and swap them in with publish. Readers just take self.view (or self.tests) without locking and get a
+        # consistent snapshot.
+        self.expiryChanged = threading.Condition()
+        self.maxSleep = 3600
+        self.listeners = []
+        self.epochs = array('q')  # epochs of self.tests in the same order, for binary searching
+        self.publish(self.readDatabase(), self.epochs)
+        with self.expiryChanged:
+            self.rankTests()
+
+        if doThread:
+            thread = threading.Thread(target=self.threadedChecker)
+            thread.daemon = True
+            thread.start()
+
+    def __getitem__(self, key):
+        return self.tests[key]
+
+    def __len__(self):
+        return len(self.tests)
+
+    def publish(self, tests, epochs):
+        self.view = (tests, epochs)  # one assignment, so readers never see tests and epochs out of step
+        self.tests = tests
+        self.epochs = epochs
+        self.length = len(tests)
+
+    def subscribe(self, listener):
+        """
+        Purpose: This function registers a function to be told about every change to the catalog. Listeners are called
+                 on the thread that made the change ('expire' comes from the expiry thread), so GUI code has to hand the
+                 event over to the Tk thread itself.
+        Parameters: This function takes the listener, a function of the event name ('add', 'remove' or 'expire') and
+                    the list of tests affected.
+        Returns: Returns the listener.
+        """
+        self.listeners.append(listener)
+        return listener
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def notify(self, event, tests):
+        for listener in list(self.listeners):
+            listener(event, tests)
+
+    def readDatabase(self,):
+        """
+        Purpose: This function reads all the upcoming tests of the user from the storage engine.
+        Parameters: N/A
+        Returns: Returns a list of tests.
+        """
+        return self.storage.load()
+
+    def updateDatabase(self):
+        """
+        Purpose: This function rewrites the storage with the current set of tests.
+        Parameters: N/A
+        Returns: N/A
+        """
+        with self.expiryChanged:
+            self.rankTests()
+            self.storage.save(self.tests)
+
+    def rankTests(self):
+        """
+        Purpose: This function makes sure the list of tests is sorted by the date of the test. addTest keeps the list
+                 in order, so this is normally just a check; it only sorts if the list was changed behind its back.
+                 Callers must hold expiryChanged.
+        Parameters: N/A
+        Returns: Returns the sorted list of tests.
+        """
+        epochs = array('q', [test.epoch for test in self.tests])
+        if epochs != self.epochs or any(epochs[i - 1] > epochs[i] for i in range(1, len(epochs))):
+            tests = sorted(self.tests, key=lambda test: test.epoch)  # stable, so tests on the same date keep their order
+            self.publish(tests, array('q', [test.epoch for test in tests]))
+
+        return self.tests
+
+    def upcoming(self, start, end):
+        """
+        Purpose: This function finds the tests taking place in a time window. The tests are kept sorted, so the window
+                 is found by binary searching the epochs and only the matching slice is copied.
+        Parameters: This function takes the start (inclusive) and end (exclusive) of the window as datetime.datetime.
+        Returns: Returns the tests in the window ordered by date.
+        """
+        tests, epochs = self.view
+        return tests[bisect.bisect_left(epochs, toEpoch(start)):bisect.bisect_left(epochs, toEpoch(end))]
+
+    def __str__(self):
+        summary = ''
+        for test in self.tests:
+            summary += test.summarize() + '\n'
+        return summary
+
+    def threadedChecker(self):
+        """
+        Purpose: This function removes tests as they expire. Instead of polling it sleeps until the earliest test date,
+                 and addTest wakes it up early when a test is added in front of the current earliest one.
+        Parameters: N/A
+        Returns: N/A
+        """
+        with self.expiryChanged:
+            while True:
+                now = toEpoch(datetime.now())
+                tests, epochs = self.view
+                # the tests are sorted, so the expired ones are always at the front
+                index = bisect.bisect_right(epochs, now)
+                if index:
+                    expired = tests[:index]
+                    self.storage.remove(expired)
+                    self.publish(tests[index:], epochs[index:])
+                    self.notify('expire', expired)
+
+                # wake up at least every maxSleep seconds in case the wall clock jumps (e.g. the computer slept)
+                timeout = self.maxSleep
+                if self.epochs:
+                    timeout = min(timeout, self.epochs[0] - now)
+                self.expiryChanged.wait(timeout)
+
+    def addTest(self, test):
+        with self.expiryChanged:
+            tests, epochs = self.view
+            index = bisect.bisect_right(epochs, test.epoch)  # after any tests on the same date
+            self.storage.add(test)
+            self.publish(tests[:index] + [test] + tests[index:],
+                         epochs[:index] + array('q', [test.epoch]) + epochs[index:])
+            if index == 0:
+                self.expiryChanged.notify()  # the earliest test changed, re-arm the expiry timer
+            self.notify('add', [test])
+        return self.tests
+
+    def removeTest(self, test):
+        with self.expiryChanged:
+            tests, epochs = self.view
+            index = tests.index(test)
+            self.storage.remove([test])
+            self.publish(tests[:index] + tests[index + 1:], epochs[:index] + epochs[index + 1:])
+            self.notify('remove', [test])
+        return self.tests
@@ -1,10 +1,15 @@
 import smtplib, ssl
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-import app
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
+import catalog
 import datetime
 import os
+import queue
+import re
 import sys
+import threading
 
 
 def readCredentials(name, root=os.path.dirname(sys.argv[0]) + "\\..\\settings.txt"):
@@ -18,54 +23,276 @@ def readCredentials(name, root=os.path.dirname(sys.argv[0]) + "\\..\\settings.tx
             return line[1], line[2]
 
 
+def readRecipients(root=os.path.dirname(sys.argv[0]) + "\\..\\settings.txt", database="database.txt"):
+    """
+    Purpose: This function reads every recipient of the batch digest from the settings file. Each recipient is a line
+             of the form recipient,<email address>,<name>,<database path>; the database path is optional.
+    Parameters: This function takes the path of the settings file and the database to use when a line has none.
+    Returns: Returns a list of (email address, name, database path) tuples.
+    """
+    if root == '\\..\\settings.txt':
+        root = "..\\settings.txt"
+    recipients = []
+    file = open(root, 'r')
+    for line in file:
+        line = [field.strip() for field in line.split(',')]
+        if line[0] == "recipient":
+            recipients.append((line[1], line[2], line[3] if len(line) > 3 and line[3] else database))
+    file.close()
+    return recipients
+
+
+def openCatalog(root):
+    """
+    Purpose: This function opens a database for window queries. SQLite databases answer them from their index on the
+             date; text databases are loaded into a sorted TestCatalog (without the expiry thread) so the window is
+             found by binary search.
+    Parameters: This function takes the path of the database as a string.
+    Returns: Returns an object with an upcoming(start, end) method.
+    """
+    storage = catalog.openStorage(root)
+    if isinstance(storage, catalog.SQLiteStorage):
+        return storage
+    return catalog.TestCatalog(doThread=False, root=root, storage=storage)
+
+
+def findUpcoming(testCatalog, now=None):
+    # tests from now until 24 hours from now; takes a database path or a catalog from openCatalog
+    if now is None:
+        now = datetime.datetime.now()
+    if isinstance(testCatalog, str):
+        testCatalog = openCatalog(testCatalog)
+    return testCatalog.upcoming(now, now + datetime.timedelta(hours=24))
+
+
+def compileTemplate(text):
+    """
+    Purpose: This function compiles a template with $placeholders once into a str.format call, so rendering a row is a
+             single C-level format instead of a regular expression pass.
+    Parameters: This function takes the template text.
+    Returns: Returns a function that takes the placeholder values as keyword arguments and returns the rendered text.
+    """
+    return re.sub(r"\$(\w+)", r"{\1}", text.replace("{", "{{").replace("}", "}}")).format
+
+
+DIGEST_HTML = compileTemplate("""\
+<html>
+  <body>
+    <p>Hi $name,<br>
+       In the next 24 hours you will have $count test(s)<br>
+    </p>
+$rows
+    <p>Happy Studying! :)
+  </body>
+</html>
+""")
+ROW_HTML = compileTemplate("""\
+    <p><b> Test Name: </b> $name <br>
+    <b> Test Time: </b> $date <br>
+    <b> Test Description: </b> $description <br>
+    </p>
+""")
+DIGEST_TEXT = compileTemplate("""\
+Hi $name,
+In the next 24 hours you will have $count test(s)
+
+$rows
+Happy Studying! :)
+""")
+UPDATE_HTML = compileTemplate("""\
+<html>
+  <body>
+    <p>Hi $name,<br>
+       $count test(s) were added to the next 24 hours since your last digest<br>
+    </p>
+$rows
+    <p>Happy Studying! :)
+  </body>
+</html>
+""")
+UPDATE_TEXT = compileTemplate("""\
+Hi $name,
+$count test(s) were added to the next 24 hours since your last digest
+
+$rows
+Happy Studying! :)
+""")
+ROW_TEXT = compileTemplate("""\
+Test Name: $name
+Test Time: $date
+Test Description: $description
+""")
+
+
+def renderDigest(name, upcoming, page=DIGEST_HTML):
+    """
+    Purpose: This function renders the HTML digest. The rows are collected in a list and joined once, and everything
+             that came from the user is HTML escaped.
+    Parameters: This function takes the receiver's name (string), the list of upcoming tests and the page template
+                the rows go in (DIGEST_HTML or UPDATE_HTML).
+    Returns: Returns the HTML as a string.
+    """
+    rows = [ROW_HTML(name=escape(test.name), date=test.date_string, description=escape(test.description))
+            for test in upcoming]
+    return page(name=escape(name), count=len(upcoming), rows="".join(rows))
+
+
+def renderText(name, upcoming, page=DIGEST_TEXT):
+    """
+    Purpose: This function renders the plain text version of the digest for mail clients that don't show HTML.
+    Parameters: This function takes the receiver's name (string), the list of upcoming tests and the page template
+                the rows go in (DIGEST_TEXT or UPDATE_TEXT).
+    Returns: Returns the text as a string.
+    """
+    rows = [ROW_TEXT(name=test.name, date=test.date_string, description=test.description) + "\n"
+            for test in upcoming]
+    return page(name=name, count=len(upcoming), rows="".join(rows))
+
+
+def buildMessage(sender_address, receiver_address, name, upcoming, subject="Upcoming Tests", textPage=DIGEST_TEXT,
+                 htmlPage=DIGEST_HTML):
+    message = MIMEMultipart("alternative")
+    message["Subject"] = subject
+    message["From"] = sender_address
+    message["To"] = receiver_address
+
+    # clients show the last part they understand, so the plain text goes first
+    message.attach(MIMEText(renderText(name, upcoming, textPage), "plain"))
+    message.attach(MIMEText(renderDigest(name, upcoming, htmlPage), "html"))
+    return message
+
+
+def buildUpdate(sender_address, receiver_address, name, added):
+    # sent by reminder_daemon when tests are added inside a window whose digest already went out
+    return buildMessage(sender_address, receiver_address, name, added, "New Upcoming Tests", UPDATE_TEXT, UPDATE_HTML)
+
+
+class SMTPPool:
+    """
+    A small pool of logged in SMTP connections. Connections are opened the first time they are needed and reused for
+    every message after that, so a batch of digests pays for the TLS handshake and login once per connection instead
+    of once per message.
+    """
+    def __init__(self, host, port, sender_address, password, size=2, useSSL=True):
+        self.host = host
+        self.port = port
+        self.sender_address = sender_address
+        self.password = password
+        self.size = size
+        self.useSSL = useSSL
+        self.idle = queue.Queue()
+        for i in range(size):
+            self.idle.put(None)  # a free slot without a connection yet
+
+    def connect(self):
+        if self.useSSL:
+            server = smtplib.SMTP_SSL(self.host, self.port, context=ssl.create_default_context())
+        else:
+            server = smtplib.SMTP(self.host, self.port)
+        try:
+            server.login(self.sender_address, self.password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def isConnectionError(self, error):
+        # every SMTP error is also an OSError, but only a disconnect (or a plain socket error) means the connection
+        # is gone; a refused recipient or rejected message leaves it logged in and usable
+        return isinstance(error, smtplib.SMTPServerDisconnected) or not isinstance(error, smtplib.SMTPException)
+
+    def send(self, receiver_address, message):
+        """
+        Purpose: This function sends a message over one of the pooled connections, waiting for a free one if they are
+                 all busy. A connection the server dropped is closed and opened again once; after any other error the
+                 connection goes back to the pool.
+        Parameters: This function takes the receiver's address (string) and the message.
+        Returns: N/A
+        """
+        server = self.idle.get()
+        try:
+            if server is None:
+                server = self.connect()
+            try:
+                server.sendmail(self.sender_address, receiver_address, message.as_string())
+            except OSError as error:
+                if not self.isConnectionError(error):
+                    raise
+                server.close()
+                server = None
+                server = self.connect()
+                server.sendmail(self.sender_address, receiver_address, message.as_string())
+        except OSError as error:
+            if server is not None and self.isConnectionError(error):
+                server.close()
+                server = None
+            raise
+        finally:
+            self.idle.put(server)
+
+    def close(self):
+        for i in range(self.size):
+            server = self.idle.get()
+            if server is not None:
+                try:
+                    server.quit()
+                except smtplib.SMTPException:
+                    pass
+
+
+def sendDigests(pool, recipients, now=None):
+    """
+    Purpose: This function renders and sends the digest of every recipient, using as many threads as the pool has
+             connections. Each database is loaded once no matter how many recipients share it, and every digest
+             covers the same 24 hours.
+    Parameters: This function takes the SMTP pool, the list of (email address, name, database path) tuples and the
+                start of the window (defaults to now).
+    Returns: Returns a list of (email address, error) for the digests that failed to send.
+    """
+    if now is None:
+        now = datetime.datetime.now()
+    catalogs = {}
+    catalogsLock = threading.Lock()
+
+    def send(recipient):
+        receiver_address, name, root = recipient
+        with catalogsLock:
+            if root not in catalogs:
+                catalogs[root] = openCatalog(root)
+        upcoming = findUpcoming(catalogs[root], now)
+        pool.send(receiver_address, buildMessage(pool.sender_address, receiver_address, name, upcoming))
+
+    failures = []
+    with ThreadPoolExecutor(max_workers=pool.size) as executor:
+        futures = [(recipient[0], executor.submit(send, recipient)) for recipient in recipients]
+        for receiver_address, future in futures:
+            if future.exception() is not None:
+                failures.append((receiver_address, future.exception()))
+    return failures
+
+
 if __name__ == "__main__":
     email_flag, _ = readCredentials("emailNotifications")
     if email_flag == "True":
         port = 465
         sender_address, password = readCredentials("emailer")
-        receiver_address, name = readCredentials("receiver")
-
-        message = MIMEMultipart("alternative")
-        message["Subject"] = "Upcoming Tests"
-        message["From"] = sender_address
-        message["To"] = receiver_address
 
         root = os.path.dirname(sys.argv[0]) + "\\database.txt"
         if root == '\\database.txt':
             root = 'database.txt'
 
-        testCatalog = app.TestCatalog(doThread=False, root=root)
-        upcoming = []
-        for test in testCatalog.tests:
-            if 24 > (test.date - datetime.datetime.now()).total_seconds() // 3600 > 0: # divide seconds to convert to hours
-                upcoming.append(test)
-
-        display = ""
-        for test in upcoming:
-            display += """\n
-               <p><b> Test Name: </b> %s <br>
-               <b> Test Time: </b> %s <br>
-               <b> Test Description: </b> %s <br>
-               </p>
-            """ % (test.name, test.date_string, test.description)
-
-        html = """\
-        <html>
-          <body>
-            <p>Hi %s,<br>
-               In the next 24 hours you will have %d test(s)<br>
-            </p>
-            %s
-            <p>Happy Studying! :)
-          </body>
-        </html>
-       """ % (name, len(upcoming), display)
-
-        text = MIMEText(html, "html")
-
-        message.attach(text)
-
-        context = ssl.create_default_context()
-        with smtplib.SMTP_SSL("smtp.gmail.com", port, context=context) as server:
-            server.login(sender_address, password)
-            server.sendmail(sender_address, receiver_address, message.as_string())
+        if "--batch" in sys.argv:
+            pool = SMTPPool("smtp.gmail.com", port, sender_address, password)
+            try:
+                for receiver_address, error in sendDigests(pool, readRecipients(database=root)):
+                    print("Could not send the digest to %s: %s" % (receiver_address, error))
+            finally:
+                pool.close()
+        else:
+            receiver_address, name = readCredentials("receiver")
+            message = buildMessage(sender_address, receiver_address, name, findUpcoming(root))
+
+            context = ssl.create_default_context()
+            with smtplib.SMTP_SSL("smtp.gmail.com", port, context=context) as server:
+                server.login(sender_address, password)
+                server.sendmail(sender_address, receiver_address, message.as_string())
@@ -0,0 +1,234 @@
+"""
+    Description: A long running reminder service that replaces scheduling emailer.py with Task Scheduler or cron. It keeps
+                 every user's catalog loaded and sends each user's digest at their own time of day. Upcoming sends are
+                 kept in a heap and the daemon sleeps until the earliest one instead of polling. Once a minute it checks
+                 whether the app changed a database, and when a test was added inside a window whose digest already
+                 went out, the user is sent an update with the new test. The time of every digest sent is saved, so
+                 after a crash or reboot a digest that was missed while the daemon was down is sent as soon as it
+                 starts again.
+    Usage: python reminder_daemon.py [--settings ../settings.txt] [--database database.txt] [--at 08:00]
+"""
+import argparse
+import heapq
+import itertools
+import json
+import os
+import sys
+import threading
+from datetime import datetime, timedelta
+import catalog
+import emailer
+
+
+def readReminderTimes(root):
+    """
+    Purpose: This function reads the time of day each user wants their digest from lines of the form
+             reminderTime,<email address>,<HH:MM> in the settings file.
+    Parameters: This function takes the path of the settings file.
+    Returns: Returns a dictionary from email address to (hour, minute).
+    """
+    times = {}
+    file = open(root, 'r')
+    for line in file:
+        line = [field.strip() for field in line.split(',')]
+        if line[0] == "reminderTime":
+            times[line[1]] = parseTime(line[2])
+    file.close()
+    return times
+
+
+def parseTime(text):
+    hour, minute = text.split(':')
+    return int(hour), int(minute)
+
+
+class ReminderDaemon:
+    watchInterval = 60  # seconds between checks for database files changed by another process
+    retryDelay = 5 * 60  # seconds before retrying a digest that failed to send
+    grace = timedelta(hours=12)  # how late a missed digest may still be sent after a restart
+
+    def __init__(self, recipients, pool, reminderTimes=None, defaultTime=(8, 0), statePath="reminder_state.json"):
+        self.recipients = {}  # email address -> (name, database path)
+        for address, name, root in recipients:
+            self.recipients[address] = (name, root)
+        self.reminderTimes = reminderTimes or {}
+        self.defaultTime = defaultTime
+        self.pool = pool
+        self.statePath = statePath
+        self.state = {}  # email address -> time the last digest was sent, as an ISO string
+        if os.path.exists(statePath):
+            file = open(statePath, 'r')
+            self.state = json.load(file)
+            file.close()
+
+        self.catalogs = {}  # database path -> (TestCatalog, signature of the files it was loaded from)
+        # email address -> (end of the window of the last digest, tests it told the user about, signature of the
+        # catalog they were checked against)
+        self.covered = {}
+        self.heap = []  # (when, tie breaker, kind, email address)
+        self.counter = itertools.count()
+        self.changed = threading.Condition()
+        self.running = True
+
+    def signature(self, root):
+        signature = []
+        for path in (root, root + ".log"):
+            signature.append(os.stat(path).st_mtime_ns if os.path.exists(path) else None)
+        return tuple(signature)
+
+    def getCatalog(self, root):
+        self.refresh(root)
+        return self.catalogs[root][0]
+
+    def refresh(self, root):
+        """
+        Purpose: This function loads the catalog of a database the first time it's needed and again whenever the files
+                 on disk changed since it was loaded (for example the app added a test).
+        Parameters: This function takes the database path (string).
+        Returns: Returns True if the catalog was (re)loaded.
+        """
+        signature = self.signature(root)
+        if root in self.catalogs and self.catalogs[root][1] == signature:
+            return False
+        # no expiry thread: the daemon only reads, removing expired tests is left to the app
+        storage = catalog.openStorage(root)
+        self.catalogs[root] = (catalog.TestCatalog(doThread=False, root=root, storage=storage), signature)
+        return True
+
+    def schedule(self, when, kind, address=None):
+        with self.changed:
+            heapq.heappush(self.heap, (when, next(self.counter), kind, address))
+            self.changed.notify()  # the new entry may be earlier than the one being waited on
+
+    def nextReminder(self, address, after):
+        hour, minute = self.reminderTimes.get(address, self.defaultTime)
+        when = after.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if when <= after:
+            when += timedelta(days=1)
+        return when
+
+    def recover(self, now):
+        """
+        Purpose: This function schedules every user's next digest. A digest whose time passed while the daemon wasn't
+                 running is sent straight away if it is less than `grace` late. Users the daemon has never sent a
+                 digest to just get their next one.
+        Parameters: This function takes the current time (datetime.datetime).
+        Returns: N/A
+        """
+        for address in self.recipients:
+            upcoming = self.nextReminder(address, now)
+            missed = upcoming - timedelta(days=1)
+            lastSent = self.state.get(address)
+            if lastSent is not None and now - missed < self.grace and datetime.fromisoformat(lastSent) < missed:
+                self.schedule(now, "digest", address)
+            else:
+                self.schedule(upcoming, "digest", address)
+
+        self.schedule(now + timedelta(seconds=self.watchInterval), "watch")
+
+    def sendDigest(self, address, now):
+        name, root = self.recipients[address]
+        end = now + timedelta(hours=24)
+        testCatalog = self.getCatalog(root)
+        upcoming = testCatalog.upcoming(now, end)
+        self.pool.send(address, emailer.buildMessage(self.pool.sender_address, address, name, upcoming))
+        self.covered[address] = (end, set(test.serialize() for test in upcoming), self.catalogs[root][1])
+        self.state[address] = now.isoformat()
+        self.saveState()
+
+    def watch(self, now):
+        """
+        Purpose: This function sends an update to every user whose digest is already out when tests were added inside
+                 the window it covered. Each user is checked against the signature of the catalog their digest (or last
+                 update) was checked against, so users sharing a database are all told, whoever's digest loaded it.
+        Parameters: This function takes the current time (datetime.datetime).
+        Returns: N/A
+        """
+        for address in list(self.covered):
+            name, root = self.recipients[address]
+            end, told, signature = self.covered[address]
+            testCatalog = self.getCatalog(root)
+            current = self.catalogs[root][1]
+            if current == signature:
+                continue
+            added = [test for test in testCatalog.upcoming(now, end) if test.serialize() not in told]
+            try:
+                if added:
+                    self.pool.send(address, emailer.buildUpdate(self.pool.sender_address, address, name, added))
+                    told.update(test.serialize() for test in added)
+                self.covered[address] = (end, told, current)
+            except Exception as error:
+                print("Could not send the update to %s: %s" % (address, error))
+
+    def saveState(self):
+        file = open(self.statePath + ".tmp", 'w')
+        json.dump(self.state, file)
+        file.close()
+        os.replace(self.statePath + ".tmp", self.statePath)
+
+    def run(self):
+        """
+        Purpose: This function is the daemon's main loop. It sleeps until the earliest scheduled entry, handles
+                 everything that is due and schedules what comes next, until stop is called.
+        Parameters: N/A
+        Returns: N/A
+        """
+        self.recover(datetime.now())
+        while True:
+            with self.changed:
+                while self.running and (not self.heap or self.heap[0][0] > datetime.now()):
+                    timeout = None
+                    if self.heap:
+                        timeout = (self.heap[0][0] - datetime.now()).total_seconds()
+                    self.changed.wait(timeout)
+                if not self.running:
+                    return
+                when, _, kind, address = heapq.heappop(self.heap)
+
+            now = datetime.now()
+            if kind == "watch":
+                self.watch(now)
+                self.schedule(now + timedelta(seconds=self.watchInterval), "watch")
+                continue
+
+            try:
+                self.sendDigest(address, now)
+                self.schedule(self.nextReminder(address, now), "digest", address)
+            except Exception as error:
+                print("Could not send the digest to %s: %s" % (address, error))
+                self.schedule(min(now + timedelta(seconds=self.retryDelay), self.nextReminder(address, now)),
+                              "digest", address)
+
+    def stop(self):
+        with self.changed:
+            self.running = False
+            self.changed.notify()
+
+
+if __name__ == "__main__":
+    here = os.path.dirname(os.path.abspath(sys.argv[0]))
+    parser = argparse.ArgumentParser(description="Send each user a digest of their upcoming tests every day.")
+    parser.add_argument("--settings", default=os.path.join(here, "..", "settings.txt"), help="path of settings.txt")
+    parser.add_argument("--database", default=os.path.join(here, "database.txt"),
+                        help="database of recipients that don't name their own")
+    parser.add_argument("--at", default="08:00", help="time of day (HH:MM) for users without a reminderTime line")
+    parser.add_argument("--state", default=os.path.join(here, "reminder_state.json"), help="where to save progress")
+    args = parser.parse_args()
+
+    email_flag, _ = emailer.readCredentials("emailNotifications", root=args.settings)
+    if email_flag != "True":
+        sys.exit("Email notifications are turned off in " + args.settings)
+    sender_address, password = emailer.readCredentials("emailer", root=args.settings)
+    recipients = emailer.readRecipients(args.settings, database=args.database)
+    if not recipients:
+        receiver_address, name = emailer.readCredentials("receiver", root=args.settings)
+        recipients = [(receiver_address.strip(), name.strip(), args.database)]
+
+    pool = emailer.SMTPPool("smtp.gmail.com", 465, sender_address.strip(), password.strip())
+    daemon = ReminderDaemon(recipients, pool, readReminderTimes(args.settings), parseTime(args.at), args.state)
+    try:
+        daemon.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pool.close()
@@ -0,0 +1,175 @@
+"""
+    Description: Local stand-ins for the services the app talks to, so the tests run without a network connection or
+                 real credentials. Each server runs on its own thread on a free port of 127.0.0.1.
+"""
+import json
+import socket
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+# a 1x1 GIF, so the thumbnails decode like real ones
+THUMBNAIL = (b"GIF89a\x01\x00\x01\x00\x80\x00\x00\x00\x00\x00\xff\xff\xff!\xf9\x04\x01\x00\x00\x00\x00,"
+             b"\x00\x00\x00\x00\x01\x00\x01\x00\x00\x02\x02D\x01\x00;")
+
+
+class YouTubeHandler(BaseHTTPRequestHandler):
+    """
+    Answers the search and videos endpoints of the YouTube Data API with made up videos v0, v1, ... and serves their
+    thumbnails. The path of every request is recorded in server.requests, and every answer waits server.delay
+    seconds first. While server.quotaExceeded is set the API endpoints answer with the API's quotaExceeded error.
+    """
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        self.server.requests.append(self.path)
+        time.sleep(self.server.delay)
+
+        if url.path.endswith(".jpg"):
+            self.send(THUMBNAIL, "image/gif")
+            return
+        if self.server.quotaExceeded:
+            body = {"error": {"code": 403, "errors": [{"reason": "quotaExceeded"}]}}
+            self.send(json.dumps(body).encode(), "application/json", 403)
+            return
+        if url.path.endswith("/search"):
+            count = int(query.get("maxResults", ["5"])[0])
+            items = [{"id": {"videoId": "v%d" % i},
+                      "snippet": {"title": "Video %d" % i, "description": "short", "channelTitle": "channel",
+                                  "thumbnails": {"default": {"url": "http://127.0.0.1:%d/v%d.jpg"
+                                                                % (self.server.server_port, i)}}}}
+                     for i in range(count)]
+        elif url.path.endswith("/videos"):
+            items = [{"id": videoId, "snippet": {"description": "full description of " + videoId},
+                      "contentDetails": {"duration": "PT4M13S"}}
+                     for videoId in query["id"][0].split(",")]
+        else:
+            self.send_error(404)
+            return
+
+        self.send(json.dumps({"items": items}).encode(), "application/json")
+
+    def send(self, body, contentType, status=200):
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+def startServer(server):
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def startYouTube():
+    """
+    Purpose: This function starts a fake YouTube API server.
+    Parameters: N/A
+    Returns: Returns the server; its base URL is "http://127.0.0.1:%d" % server.server_port and the requests it got
+             are in server.requests. Call server.shutdown() when done.
+    """
+    server = ThreadingHTTPServer(("127.0.0.1", 0), YouTubeHandler)
+    server.requests = []
+    server.delay = 0
+    server.quotaExceeded = False
+    return startServer(server)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Speaks just enough SMTP for smtplib: it accepts any login, refuses the recipients in server.refused and records the
+    number of connections and logins and the recipients of every message delivered.
+    """
+    def reply(self, text):
+        self.wfile.write((text + "\r\n").encode())
+
+    def handle(self):
+        with self.server.lock:
+            self.server.connections += 1
+            self.server.open.append(self.connection)
+        self.reply("220 stub ready")
+        recipients = []
+        data = None
+        while True:
+            line = self.rfile.readline().decode()
+            if not line:
+                return
+            if data is not None:
+                if line == ".\r\n":
+                    self.server.messages.append((recipients, "".join(data)))
+                    recipients, data = [], None
+                    self.reply("250 queued")
+                else:
+                    data.append(line)
+                continue
+
+            command = line[:4].upper()
+            if command == "EHLO":
+                self.reply("250-stub")
+                self.reply("250 AUTH PLAIN LOGIN")
+            elif command == "AUTH":
+                self.server.logins += 1
+                self.reply("235 authenticated")
+            elif command == "RCPT":
+                address = line[line.index("<") + 1:line.index(">")]
+                if address in self.server.refused:
+                    self.reply("550 no such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 ok")
+            elif command == "DATA":
+                data = []
+                self.reply("354 go ahead")
+            elif command == "RSET":
+                recipients = []
+                self.reply("250 ok")
+            elif command == "QUIT":
+                self.reply("221 bye")
+                return
+            else:
+                self.reply("250 ok")
+
+
+class SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), SMTPHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.logins = 0
+        self.messages = []
+        self.refused = set()
+        self.open = []
+
+    def dropConnections(self):
+        """
+        Purpose: This function hangs up on every client, like a mail server closing idle connections.
+        Parameters: N/A
+        Returns: N/A
+        """
+        with self.lock:
+            for connection in self.open:
+                try:
+                    connection.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+            self.open = []
+
+
+def startSMTP():
+    """
+    Purpose: This function starts a fake SMTP server.
+    Parameters: N/A
+    Returns: Returns the server; it listens on 127.0.0.1 at server.server_address[1]. Call server.shutdown() when
+             done.
+    """
+    return startServer(SMTPServer())
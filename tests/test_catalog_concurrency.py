@@ -0,0 +1,90 @@
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from datetime import datetime, timedelta
+import catalog
+
+
+class ConcurrentCatalogTest(unittest.TestCase):
+    """
+    Many threads adding tests at once while others read the catalog, run against every storage engine. Every add must
+    reach the disk and readers must never see the tests and their epochs out of step.
+    """
+    adders = 16
+
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def stress(self, storage, addsPerThread, saver=False):
+        tests = catalog.TestCatalog(doThread=False, root=storage.root, storage=storage)
+        stop = threading.Event()
+        problems = []
+
+        def read():
+            while not stop.is_set():
+                view, epochs = tests.view
+                if len(view) != len(epochs) or any(epochs[i - 1] > epochs[i] for i in range(1, len(epochs))):
+                    problems.append("inconsistent view")
+                time.sleep(0.001)
+
+        def add(k):
+            generator = random.Random(k)
+            for i in range(addsPerThread):
+                date = datetime(2031, 1, 1) + timedelta(minutes=generator.randrange(100000))
+                tests.addTest(catalog.Test("test %d %d" % (k, i), date, "description"))
+
+        def save():
+            while not stop.is_set():
+                tests.updateDatabase()  # full rewrites racing the journal's background compactions
+                time.sleep(0.001)
+
+        readers = [threading.Thread(target=read) for i in range(2)]
+        if saver:
+            readers.append(threading.Thread(target=save))
+        writers = [threading.Thread(target=add, args=(k,)) for k in range(self.adders)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        deadline = time.time() + 10
+        while getattr(storage, "compacting", False) and time.time() < deadline:
+            time.sleep(0.01)
+
+        expected = self.adders * addsPerThread
+        self.assertEqual(problems, [])
+        self.assertEqual(len(tests), expected)
+        self.assertEqual(list(tests.epochs), sorted(tests.epochs))
+        self.assertEqual(len(type(storage)(storage.root).load()), expected)
+
+    def testFlatFile(self):
+        root = os.path.join(self.folder, "database.txt")
+        open(root, 'w').close()
+        self.stress(catalog.FlatFileStorage(root), 5)
+
+    def testJournal(self):
+        root = os.path.join(self.folder, "database.txt")
+        open(root, 'w').close()
+        self.stress(catalog.JournalStorage(root, compactThreshold=50), 25)
+
+    def testJournalWithSaves(self):
+        root = os.path.join(self.folder, "database.txt")
+        open(root, 'w').close()
+        self.stress(catalog.JournalStorage(root, compactThreshold=20), 25, saver=True)
+
+    def testSQLite(self):
+        self.stress(catalog.SQLiteStorage(os.path.join(self.folder, "database.db")), 25)
+
+
+if __name__ == "__main__":
+    unittest.main()
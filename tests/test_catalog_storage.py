@@ -0,0 +1,157 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import catalog
+
+
+class JournalStorageTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.root = os.path.join(self.folder, "database.txt")
+        open(self.root, 'w').close()
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def names(self, storage):
+        return sorted(test.name for test in storage.load())
+
+    def testLeftoverRotatedJournalSurvivesCompaction(self):
+        # what a compaction that crashed after rotating the journal leaves behind
+        file = open(self.root + ".log.old", 'w')
+        file.write("+,1,lost,May 30 2030 10:00AM,x\n")
+        file.close()
+
+        storage = catalog.JournalStorage(self.root)
+        self.assertEqual(self.names(storage), ["lost"])
+        for i in range(3):
+            storage.add(catalog.Test("test %d" % i, datetime(2030, 6, 1 + i), "description"))
+        storage.compact()
+
+        self.assertFalse(os.path.exists(self.root + ".log.old"))
+        self.assertEqual(self.names(catalog.JournalStorage(self.root)), ["lost", "test 0", "test 1", "test 2"])
+
+    def testIdenticalTestsSurviveARestart(self):
+        tests = catalog.TestCatalog(doThread=False, root=self.root, storage=catalog.JournalStorage(self.root))
+        tests.addTest(catalog.Test("Math", datetime(2030, 1, 1, 9), "chapter 1"))
+        tests.addTest(catalog.Test("Math", datetime(2030, 1, 1, 9), "chapter 1"))
+
+        self.assertEqual(len(catalog.JournalStorage(self.root).load()), 2)
+        tests.updateDatabase()
+        self.assertEqual(len(catalog.JournalStorage(self.root).load()), 2)
+        self.assertEqual(len(catalog.FlatFileStorage(self.root).load()), 2)
+
+    def testTestWithACommaSurvivesARestart(self):
+        tests = catalog.TestCatalog(doThread=False, root=self.root, storage=catalog.JournalStorage(self.root))
+        tests.addTest(catalog.Test("Math", datetime(2030, 1, 1, 9), "chapters 1, 2 and 3"))
+        tests.addTest(catalog.Test("Bio", datetime(2030, 1, 2, 9), "cells"))
+
+        self.assertEqual(self.names(catalog.JournalStorage(self.root)), ["Bio", "Math"])
+        storage = catalog.JournalStorage(self.root)
+        storage.compact()
+        self.assertEqual(self.names(catalog.JournalStorage(self.root)), ["Bio", "Math"])
+
+    def testReplayingAFoldedJournalChangesNothing(self):
+        storage = catalog.JournalStorage(self.root)
+        storage.load()
+        storage.add(catalog.Test("Bio", datetime(2030, 2, 1), "cells"))
+        # a crash between writing the snapshot and deleting the journal
+        storage.writeSnapshot(storage.load(), storage.header + str(storage.sequence))
+
+        self.assertEqual(self.names(catalog.JournalStorage(self.root)), ["Bio"])
+
+    def testSaveDuringCompactionIsKept(self):
+        storage = catalog.JournalStorage(self.root)
+        storage.add(catalog.Test("Bio", datetime(2030, 2, 1), "cells"))
+        readSnapshot = storage.readSnapshot
+
+        def saveMeanwhile():
+            # after the journal is rotated, a test is added and the catalog rewrites the whole database
+            snapshot = readSnapshot()
+            storage.readSnapshot = readSnapshot
+            storage.add(catalog.Test("Chem", datetime(2030, 3, 1), "acids"))
+            storage.save(storage.load())
+            return snapshot
+        storage.readSnapshot = saveMeanwhile
+        storage.compact()
+
+        self.assertEqual(self.names(catalog.JournalStorage(self.root)), ["Bio", "Chem"])
+
+    def testFailedCompactionDoesNotDisableCompaction(self):
+        storage = catalog.JournalStorage(self.root)
+        storage.add(catalog.Test("Bio", datetime(2030, 2, 1), "cells"))
+
+        def fail():
+            raise OSError("disk full")
+        storage.readSnapshot = fail
+        storage.compacting = True
+        self.assertRaises(OSError, storage.compact)
+        self.assertFalse(storage.compacting)
+
+
+
+class UpcomingWindowTest(unittest.TestCase):
+    """
+    Checks the [start, end) window of TestCatalog.upcoming (binary search), Storage.upcoming (the scan fallback used
+    by the text engines) and SQLiteStorage.upcoming (the index) against each other.
+    """
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.start = datetime(2030, 1, 1, 9)
+        self.end = self.start + timedelta(hours=24)
+        self.tests = [catalog.Test("after the end", self.end + timedelta(seconds=1), "out"),
+                      catalog.Test("at the end", self.end, "out"),
+                      catalog.Test("same second 1", self.start + timedelta(hours=5), "in"),
+                      catalog.Test("before the start", self.start - timedelta(seconds=1), "out"),
+                      catalog.Test("in 59 minutes", self.start + timedelta(minutes=59), "in"),
+                      catalog.Test("at the start", self.start, "in"),
+                      catalog.Test("same second 2", self.start + timedelta(hours=5), "in"),
+                      catalog.Test("last second", self.end - timedelta(seconds=1), "in")]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def engines(self):
+        root = os.path.join(self.folder, "database.txt")
+        open(root, 'w').close()
+        journal = catalog.JournalStorage(root)
+        journal.save(self.tests)
+        sqlite = catalog.SQLiteStorage(os.path.join(self.folder, "database.db"))
+        sqlite.save(self.tests)
+        return {"TestCatalog": catalog.TestCatalog(doThread=False, root=root, storage=journal),
+                "JournalStorage": journal, "SQLiteStorage": sqlite}
+
+    def names(self, tests):
+        # tests due at the same second may come back in either order
+        return [test.name if not test.name.startswith("same second") else "same second" for test in tests]
+
+    def testWindowIncludesTheStartAndExcludesTheEnd(self):
+        for engine, source in self.engines().items():
+            self.assertEqual(self.names(source.upcoming(self.start, self.end)),
+                             ["at the start", "in 59 minutes", "same second", "same second", "last second"], engine)
+
+    def testTestsAtTheSameSecondAreAllReturned(self):
+        moment = self.start + timedelta(hours=5)
+        for engine, source in self.engines().items():
+            upcoming = source.upcoming(moment, moment + timedelta(seconds=1))
+            self.assertEqual(sorted(test.name for test in upcoming), ["same second 1", "same second 2"], engine)
+            self.assertEqual(source.upcoming(moment, moment), [], engine)
+
+    def testTestDueInUnderAnHourIsIncluded(self):
+        now = self.start + timedelta(seconds=30)
+        for engine, source in self.engines().items():
+            self.assertEqual(self.names(source.upcoming(now, now + timedelta(hours=1)))[:1], ["in 59 minutes"],
+                             engine)
+
+    def testEmptyWindowAndEmptyCatalog(self):
+        for engine, source in self.engines().items():
+            self.assertEqual(source.upcoming(self.end + timedelta(days=1), self.end + timedelta(days=2)), [], engine)
+        self.tests = []
+        for engine, source in self.engines().items():
+            self.assertEqual(source.upcoming(self.start, self.end), [], engine)
+
+
+if __name__ == "__main__":
+    unittest.main()
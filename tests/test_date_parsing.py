@@ -0,0 +1,46 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+import catalog
+
+
+FORMAT = '%b %d %Y %I:%M%p'
+
+
+class DateParsingTest(unittest.TestCase):
+    def sampleDates(self):
+        generator = random.Random(5)
+        dates = [datetime(2020, month, 1) for month in range(1, 13)]  # every month name
+        dates += [datetime(2024, 2, 29, hour, 30) for hour in range(24)]  # every hour, 12AM and 12PM included
+        dates += [datetime(1970, 1, 1) + timedelta(minutes=generator.randrange(100 * 366 * 24 * 60))
+                  for i in range(5000)]
+        return dates
+
+    def testMatchesStrptime(self):
+        for date in self.sampleDates():
+            text = date.strftime(FORMAT)
+            self.assertEqual(catalog.parseDateString(text), datetime.strptime(text, FORMAT), text)
+
+    def testMatchesDateString(self):
+        for date in self.sampleDates():
+            test = catalog.Test("name", date, "description")
+            self.assertEqual(test.date_string, date.strftime(FORMAT))
+            self.assertEqual(catalog.parseDateString(test.date_string), date)
+
+    def testDayThatIsNotZeroPaddedFallsBackToStrptime(self):
+        self.assertEqual(catalog.parseDateString("May 3 2020 10:00AM"), datetime(2020, 5, 3, 10))
+        self.assertEqual(catalog.parseDateString("May 03 2020 9:05PM"), datetime(2020, 5, 3, 21, 5))
+        self.assertRaises(ValueError, catalog.parseDateString, "May 32 2020 10:00AM")
+        self.assertRaises(ValueError, catalog.parseDateString, "May 30 2020 13:00PM")
+
+    def testBatchMatchesOneAtATime(self):
+        texts = [date.strftime(FORMAT) for date in self.sampleDates()]
+        texts += ["May 3 2020 10:00AM", "May 30 2020 10:00AM", "May 30 2020 10:00AM", "Jun 30 2020 10:00AM"]
+        expected = [datetime.strptime(text, FORMAT) for text in texts]
+
+        self.assertEqual(catalog.parseDateStrings(texts), expected)
+        self.assertEqual(catalog.parseDateStrings(texts, epochs=True), [catalog.toEpoch(date) for date in expected])
+
+
+if __name__ == "__main__":
+    unittest.main()
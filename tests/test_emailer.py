@@ -0,0 +1,159 @@
+import os
+import shutil
+import smtplib
+import tempfile
+import time
+import unittest
+from datetime import datetime, timedelta
+import catalog
+import emailer
+from tests import stubs
+
+
+class SMTPPoolTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stubs.startSMTP()
+        self.pool = emailer.SMTPPool("127.0.0.1", self.server.server_address[1], "me@example.com", "password",
+                                     size=1, useSSL=False)
+        self.message = emailer.buildMessage("me@example.com", "you@example.com", "You",
+                                            [catalog.Test("Math", datetime(2030, 1, 1, 9), "chapter 1")])
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def testConnectionIsReused(self):
+        for i in range(5):
+            self.pool.send("you@example.com", self.message)
+
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.logins, 1)
+
+    def testDroppedConnectionIsOpenedAgain(self):
+        self.pool.send("you@example.com", self.message)
+        self.server.dropConnections()
+        time.sleep(0.1)
+        self.pool.send("you@example.com", self.message)
+
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(self.server.logins, 2)
+
+    def testRefusedRecipientKeepsTheConnection(self):
+        self.server.refused.add("nobody@example.com")
+        self.pool.send("you@example.com", self.message)
+        self.assertRaises(smtplib.SMTPRecipientsRefused, self.pool.send, "nobody@example.com", self.message)
+        self.pool.send("you@example.com", self.message)
+
+        self.assertEqual([recipients for recipients, text in self.server.messages],
+                         [["you@example.com"], ["you@example.com"]])
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.server.logins, 1)
+
+
+class DigestRenderingTest(unittest.TestCase):
+    def setUp(self):
+        self.upcoming = [catalog.Test("<b>Math</b> & Physics", datetime(2030, 1, 1, 9), 'bring "notes" & <pen>'),
+                         catalog.Test("History", datetime(2030, 1, 1, 14, 30), "chapter 2")]
+
+    def testHTMLEscapesEverythingFromTheUser(self):
+        html = emailer.renderDigest("Tom & <Jerry>", self.upcoming)
+
+        self.assertIn("Hi Tom &amp; &lt;Jerry&gt;,", html)
+        self.assertIn("&lt;b&gt;Math&lt;/b&gt; &amp; Physics", html)
+        self.assertIn("bring &quot;notes&quot; &amp; &lt;pen&gt;", html)
+        self.assertNotIn("<b>Math", html)
+        self.assertNotIn("<Jerry>", html)
+        self.assertNotIn("<pen>", html)
+
+    def testHTMLHasEveryRowInOrder(self):
+        html = emailer.renderDigest("Ann", self.upcoming)
+
+        self.assertIn("you will have 2 test(s)", html)
+        self.assertEqual(html.count("Test Name:"), 2)
+        self.assertLess(html.index("Jan 01 2030 09:00AM"), html.index("Jan 01 2030 02:30PM"))
+        self.assertLess(html.index("Physics"), html.index("History"))
+
+    def testTextIsNotEscaped(self):
+        text = emailer.renderText("Tom & <Jerry>", self.upcoming)
+
+        self.assertIn("Hi Tom & <Jerry>,", text)
+        self.assertIn("you will have 2 test(s)", text)
+        self.assertIn("Test Name: <b>Math</b> & Physics", text)
+        self.assertIn('Test Description: bring "notes" & <pen>', text)
+        self.assertIn("Test Time: Jan 01 2030 02:30PM", text)
+        self.assertNotIn("&amp;", text)
+
+    def testNoUpcomingTests(self):
+        self.assertIn("you will have 0 test(s)", emailer.renderDigest("Ann", []))
+        self.assertIn("you will have 0 test(s)", emailer.renderText("Ann", []))
+
+    def testMessageHasTextThenHTML(self):
+        message = emailer.buildMessage("me@example.com", "ann@example.com", "Ann", self.upcoming)
+        parts = message.get_payload()
+
+        self.assertEqual(message["Subject"], "Upcoming Tests")
+        self.assertEqual([part.get_content_type() for part in parts], ["text/plain", "text/html"])
+        self.assertIn("&lt;pen&gt;", parts[1].get_payload(decode=True).decode())
+
+
+
+class FindUpcomingTest(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.mkdtemp()
+        self.now = datetime(2030, 1, 1, 9, 0, 30)
+        self.tests = [catalog.Test("Math", self.now + timedelta(minutes=20), "due in under an hour"),
+                      catalog.Test("Art", self.now + timedelta(hours=30), "next day"),
+                      catalog.Test("History", self.now + timedelta(hours=23, minutes=59), "end of the window"),
+                      catalog.Test("Physics", self.now - timedelta(minutes=1), "already started")]
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+
+    def writeDatabase(self, name):
+        root = os.path.join(self.folder, name)
+        open(root, 'a').close()
+        catalog.openStorage(root).save(self.tests)
+        return root
+
+    def testTextAndSQLiteDatabasesAgree(self):
+        for name in ("database.txt", "database.db"):
+            root = self.writeDatabase(name)
+            self.assertEqual([test.name for test in emailer.findUpcoming(root, self.now)], ["Math", "History"], name)
+            self.assertEqual([test.name for test in emailer.findUpcoming(emailer.openCatalog(root), self.now)],
+                             ["Math", "History"], name)
+
+    def testTextDatabaseIsBinarySearched(self):
+        root = self.writeDatabase("database.txt")
+        testCatalog = emailer.openCatalog(root)
+
+        self.assertIsInstance(testCatalog, catalog.TestCatalog)
+        self.assertEqual([test.name for test in testCatalog.tests], ["Physics", "Math", "History", "Art"])
+
+    def testBatchLoadsEachDatabaseOnce(self):
+        root = self.writeDatabase("database.txt")
+        server = stubs.startSMTP()
+        pool = emailer.SMTPPool("127.0.0.1", server.server_address[1], "me@example.com", "password", size=2,
+                                useSSL=False)
+        opened = []
+        openCatalog = emailer.openCatalog
+        emailer.openCatalog = lambda root: opened.append(root) or openCatalog(root)
+        try:
+            recipients = [("user%d@example.com" % i, "User %d" % i, root) for i in range(4)]
+            self.assertEqual(emailer.sendDigests(pool, recipients, now=self.now), [])
+        finally:
+            emailer.openCatalog = openCatalog
+            pool.close()
+            server.shutdown()
+            server.server_close()
+
+        self.assertEqual(opened, [root])
+        self.assertEqual(len(server.messages), 4)
+        for recipients, text in server.messages:
+            self.assertIn("you will have 2 test(s)", text)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,16 @@
+import os
+import subprocess
+import sys
+import unittest
+
+
+class HeadlessImportTest(unittest.TestCase):
+    def testHeadlessModulesDoNotImportTheGUI(self):
+        script = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "benchmarks",
+                              "bench_imports.py")
+        result = subprocess.run([sys.executable, script], capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout + result.stderr)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import catalog
+import emailer
+import reminder_daemon
+from tests import stubs
+
+
+class ReminderDaemonTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stubs.startSMTP()
+        self.pool = emailer.SMTPPool("127.0.0.1", self.server.server_address[1], "me@example.com", "password",
+                                     size=1, useSSL=False)
+        self.folder = tempfile.mkdtemp()
+        self.root = os.path.join(self.folder, "database.txt")
+        self.statePath = os.path.join(self.folder, "reminder_state.json")
+        open(self.root, 'w').close()
+        self.now = datetime.now().replace(second=0, microsecond=0)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def makeDaemon(self, hoursAgo=1):
+        # the user's digest time was hoursAgo hours before now
+        digestTime = self.now - timedelta(hours=hoursAgo)
+        return reminder_daemon.ReminderDaemon([("you@example.com", "You", self.root)], self.pool,
+                                              {"you@example.com": (digestTime.hour, digestTime.minute)},
+                                              statePath=self.statePath)
+
+    def scheduled(self, daemon):
+        return [(when, kind) for when, _, kind, address in sorted(daemon.heap)]
+
+    def testFirstLaunchWaitsForTheNextDigest(self):
+        daemon = self.makeDaemon()
+        daemon.recover(self.now)
+
+        self.assertEqual(self.scheduled(daemon)[0], (self.now + timedelta(seconds=daemon.watchInterval), "watch"))
+        self.assertEqual(self.scheduled(daemon)[1], (self.now + timedelta(hours=23), "digest"))
+
+    def testMissedDigestIsSentOnRestart(self):
+        file = open(self.statePath, 'w')
+        json.dump({"you@example.com": (self.now - timedelta(days=1, hours=1)).isoformat()}, file)
+        file.close()
+        daemon = self.makeDaemon()
+        daemon.recover(self.now)
+
+        self.assertEqual(self.scheduled(daemon)[0], (self.now, "digest"))
+
+    def testDigestAlreadySentIsNotSentAgain(self):
+        file = open(self.statePath, 'w')
+        json.dump({"you@example.com": (self.now - timedelta(minutes=30)).isoformat()}, file)
+        file.close()
+        daemon = self.makeDaemon()
+        daemon.recover(self.now)
+
+        self.assertEqual(self.scheduled(daemon)[1], (self.now + timedelta(hours=23), "digest"))
+
+    def testTestAddedAfterTheDigestIsSentAsAnUpdate(self):
+        storage = catalog.openStorage(self.root)
+        storage.add(catalog.Test("Math", self.now + timedelta(hours=3), "chapter 1"))
+        daemon = self.makeDaemon()
+        daemon.sendDigest("you@example.com", self.now)
+        daemon.watch(self.now)  # nothing changed yet
+        self.assertEqual(len(self.server.messages), 1)
+
+        storage.add(catalog.Test("Biology", self.now + timedelta(hours=5), "cells"))
+        storage.add(catalog.Test("History", self.now + timedelta(days=3), "later than the digest covers"))
+        daemon.watch(self.now)
+
+        self.assertEqual(len(self.server.messages), 2)
+        update = self.server.messages[1][1]
+        self.assertIn("Biology", update)
+        self.assertNotIn("Math", update)
+        self.assertNotIn("History", update)
+        self.assertIn("Subject: New Upcoming Tests", update)
+        self.assertIn("1 test(s) were added", update)
+        self.assertNotIn("you will have", update)
+        self.assertIn("you@example.com", json.load(open(self.statePath)))
+
+    def testUsersSharingADatabaseAreAllUpdated(self):
+        storage = catalog.openStorage(self.root)
+        storage.add(catalog.Test("Math", self.now + timedelta(hours=3), "chapter 1"))
+        daemon = reminder_daemon.ReminderDaemon([("ann@example.com", "Ann", self.root),
+                                                 ("bob@example.com", "Bob", self.root)], self.pool,
+                                                statePath=self.statePath)
+        daemon.sendDigest("ann@example.com", self.now)
+        storage.add(catalog.Test("Biology", self.now + timedelta(hours=5), "cells"))
+        # Bob's digest reloads the shared catalog, so it already has Biology in it
+        daemon.sendDigest("bob@example.com", self.now)
+        daemon.watch(self.now)
+
+        self.assertEqual(len(self.server.messages), 3)
+        recipients, update = self.server.messages[2]
+        self.assertEqual(recipients, ["ann@example.com"])
+        self.assertIn("Biology", update)
+        self.assertNotIn("Math", update)
+
+        daemon.watch(self.now)  # both users are up to date now
+        self.assertEqual(len(self.server.messages), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,198 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import app
+import catalog
+from datetime import datetime
+from tests import stubs
+
+
+class StubServerTest(unittest.TestCase):
+    def setUp(self):
+        self.server = stubs.startYouTube()
+        self.folder = tempfile.mkdtemp()
+        # the client reads its key from ../api_key.txt, so work from a folder below the one holding the key
+        file = open(os.path.join(self.folder, "api_key.txt"), 'w')
+        file.write("yt,TESTKEY\n")
+        file.close()
+        os.mkdir(os.path.join(self.folder, "work"))
+        self.cwd = os.getcwd()
+        os.chdir(os.path.join(self.folder, "work"))
+
+        self.base_url = app.YouTubeAPI.base_url
+        app.YouTubeAPI.base_url = "http://127.0.0.1:%d/youtube/v3" % self.server.server_port
+
+    def tearDown(self):
+        app.YouTubeAPI.base_url = self.base_url
+        os.chdir(self.cwd)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.folder)
+
+    def makeClient(self, cache=None):
+        if cache is None:
+            cache = app.ResponseCache("cache.db")
+        return app.YouTubeAPI(cache=cache, http=app.HTTPClient(), quota=app.QuotaManager("quota.json"))
+
+
+class YouTubeAPITest(StubServerTest):
+    def testTenResultsCostTwoRequests(self):
+        client = self.makeClient()
+        videos = client.searchVideo("linear algebra", 10)
+        durations = [video.video_duration for video in client.hydrate(videos)]
+
+        self.assertEqual(len(videos), 10)
+        self.assertEqual(durations, ["4m13s"] * 10)
+        self.assertEqual(videos[3].full_description, "full description of v3")
+        self.assertEqual(len(self.server.requests), 2)  # one search and one batched videos call
+        self.assertIn("/videos?", self.server.requests[1])
+        self.assertEqual(client.unitsUsed, 101)
+
+    def testRepeatedSearchIsServedFromTheCache(self):
+        client = self.makeClient()
+        client.searchVideo("Linear  Algebra", 10, hydrate=True)
+        videos = client.searchVideo("linear algebra", 5, hydrate=True)
+
+        self.assertEqual([video.video_id for video in videos], ["v0", "v1", "v2", "v3", "v4"])
+        self.assertEqual(len(self.server.requests), 2)
+
+    def testDetailsAreFetchedFiftyIdsAtATime(self):
+        client = self.makeClient()
+        details = client.getVideoDetails(["id%d" % i for i in range(120)])
+
+        self.assertEqual(len(details), 120)
+        self.assertEqual(len(self.server.requests), 3)
+
+    def searches(self):
+        return [path for path in self.server.requests if "/search?" in path]
+
+    def runAtOnce(self, calls):
+        results = [None] * len(calls)
+
+        def run(i):
+            results[i] = calls[i]()
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(calls))]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.01)  # so the first call is the one that goes to the server
+        for thread in threads:
+            thread.join()
+        return results
+
+    def testConcurrentIdenticalSearchesShareOneRequest(self):
+        self.server.delay = 0.3
+        clients = [self.makeClient() for i in range(8)]
+        results = self.runAtOnce([lambda client=client: client.searchVideo("Linear Algebra", 10) for client in clients])
+
+        self.assertEqual(len(self.searches()), 1)
+        self.assertEqual([len(videos) for videos in results], [10] * 8)
+
+    def testSmallerSearchIsServedByALargerOneInFlight(self):
+        self.server.delay = 0.3
+        client = self.makeClient()
+        results = self.runAtOnce([lambda: client.searchVideo("algebra", 10), lambda: client.searchVideo("algebra", 3),
+                                  lambda: client.searchVideo(" ALGEBRA ", 7)])
+
+        self.assertEqual(len(self.searches()), 1)
+        self.assertEqual([len(videos) for videos in results], [10, 3, 7])
+        self.assertEqual([video.video_id for video in results[1]], ["v0", "v1", "v2"])
+
+
+class QuotaTest(StubServerTest):
+    def setUp(self):
+        super().setUp()
+        for shared in (app.ResponseCache, app.QuotaManager, app.ThumbnailCache):
+            self.addCleanup(setattr, shared, "instances", shared.instances)
+            shared.instances = {}  # so the prefetcher's clients share this test's quota file
+
+    def testQuotaErrorOnSearchFallsBackToTheCache(self):
+        client = self.makeClient(app.ResponseCache("cache.db", ttl=0))  # every entry is stale straight away
+        client.searchVideo("algebra", 10, hydrate=True)
+        self.server.quotaExceeded = True
+
+        videos = client.searchVideo("algebra", 10)
+        self.assertEqual(len(videos), 10)
+        self.assertEqual(len(self.server.requests), 3)  # search, videos and the search that got the quota error
+        self.assertEqual(client.quota.usage()["keys"][client.quota.keyId("TESTKEY")]["remaining"], 0)
+
+        self.assertEqual(len(client.searchVideo("algebra", 10)), 10)
+        self.assertEqual(len(self.server.requests), 3)  # the key is marked as spent, so no more requests
+
+    def testQuotaErrorOnDetailsFallsBackToTheCache(self):
+        client = self.makeClient(app.ResponseCache("cache.db", ttl=0))
+        videos = client.searchVideo("algebra", 10, hydrate=True)
+        self.server.quotaExceeded = True
+
+        details = client.getVideoDetails(["v0", "v1"])
+        self.assertEqual(details["v1"]["snippet"]["description"], "full description of v1")
+        self.assertEqual(len(self.server.requests), 3)  # search, videos and the videos call that got the quota error
+        videos[2].details = None
+        self.assertEqual(videos[2].full_description, "full description of v2")
+
+    def testPrefetcherStopsAtItsBudgetOfTheSharedQuota(self):
+        tests = [catalog.Test("Math", datetime(2030, 1, 1), "algebra"), catalog.Test("Bio", datetime(2030, 1, 2), "cells")]
+        app.QuotaManager.shared().acquire("TESTKEY", "search", 1950)
+
+        self.assertEqual(app.Prefetcher(tests, budget=2000).prefetch(), 0)
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(app.Prefetcher(tests, budget=2100).prefetch(), 1)
+
+        usage = app.QuotaManager.shared().usage()["keys"][app.QuotaManager.shared().keyId("TESTKEY")]
+        self.assertEqual(usage["units"], 1950 + 101)
+
+
+class AsyncYouTubeAPITest(StubServerTest):
+    def testSearchesRunConcurrently(self):
+        client = app.AsyncYouTubeAPI(self.makeClient(), concurrency=3)
+        try:
+            results = asyncio.run(client.searchVideos(["algebra", "biology", "chemistry", "drawing"], 5))
+        finally:
+            client.close()
+
+        self.assertEqual([len(videos) for videos in results], [5, 5, 5, 5])
+        self.assertEqual(len(self.server.requests), 4)
+
+    def testInstanceWorksAcrossEventLoops(self):
+        client = app.AsyncYouTubeAPI(self.makeClient(), concurrency=1)  # so calls queue up in both loops
+        try:
+            first = asyncio.run(client.searchVideos(["algebra", "art"], 5))
+            second = asyncio.run(client.searchVideos(["biology", "chemistry"], 5))
+            videos = asyncio.run(client.hydrate(second[0]))
+            duration = asyncio.run(client.getVideoDuration(videos[0]))
+        finally:
+            client.close()
+
+        self.assertEqual([len(videos) for videos in first + second], [5, 5, 5, 5])
+        self.assertEqual(duration, "4m13s")
+
+
+class ThumbnailCacheTest(StubServerTest):
+    def testConcurrentDownloadsOfTheSameThumbnail(self):
+        video = self.makeClient().searchVideo("algebra", 1)[0]
+        thumbnails = app.ThumbnailCache("thumbnails", http=app.HTTPClient())
+        self.server.delay = 0.1  # so every thread is downloading at the same time
+        results = []
+        errors = []
+
+        def download():
+            try:
+                results.append(thumbnails.getBytes(video))
+            except Exception as error:
+                errors.append(error)
+        threads = [threading.Thread(target=download) for i in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(results, [stubs.THUMBNAIL] * 8)
+        self.assertEqual(os.listdir("thumbnails"), ["v0.jpg"])
+
+
+if __name__ == "__main__":
+    unittest.main()